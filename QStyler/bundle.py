@@ -0,0 +1,241 @@
+#! /usr/bin/python3
+# -*- coding: utf-8 -*-
+
+##############################################################################
+#  Copyright 2022 alexpdev
+#
+#  Licensed under the Apache License, Version 2.0 (the "License");
+#  you may not use this file except in compliance with the License.
+#  You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+#  Unless required by applicable law or agreed to in writing, software
+#  distributed under the License is distributed on an "AS IS" BASIS,
+#  WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#  See the License for the specific language governing permissions and
+#  limitations under the License.
+##############################################################################
+"""
+Pack a directory of themes into a single memory mapped bundle file.
+
+Build a bundle with ``python -m QStyler.bundle pack THEMES_DIR BUNDLE`` and
+extract it again with ``python -m QStyler.bundle unpack BUNDLE THEMES_DIR``.
+
+A bundle starts with a fixed header: the magic bytes, the format version,
+flags and the length of the index.  The index is compact json listing the
+name, offset and length of every theme, and is followed by the compact
+json payloads, optionally zlib compressed.
+"""
+
+import argparse
+import json
+import mmap
+import os
+import struct
+import sys
+import zlib
+from pathlib import Path
+
+MAGIC = b"QSTB"
+VERSION = 1
+COMPRESSED = 1
+HEADER = struct.Struct("<4sHHI")
+SUFFIX = ".json"
+COMPACT = (",", ":")
+BUNDLE = Path(__file__).parent / "themes.qstb"
+
+
+class BundleError(Exception):
+    """Raised when a file is not a valid theme bundle."""
+
+
+def pack(directory, path, compress=False):
+    """
+    Write every theme in `directory` to a bundle file.
+
+    Parameters
+    ----------
+    directory : str or os.PathLike
+        the directory holding the theme json files.
+    path : str or os.PathLike
+        the bundle file to create.
+    compress : bool
+        zlib compress the theme payloads.
+
+    Returns
+    -------
+    int
+        the number of themes packed.
+    """
+    index, payloads, offset = [], [], 0
+    for theme_path in sorted(Path(directory).glob("*" + SUFFIX)):
+        with open(theme_path, "rt", encoding="utf8") as fd:
+            theme = json.load(fd)
+        data = json.dumps(theme, separators=COMPACT).encode("utf8")
+        if compress:
+            data = zlib.compress(data, 9)
+        index.append([theme_path.stem, offset, len(data)])
+        payloads.append(data)
+        offset += len(data)
+    header = json.dumps(index, separators=COMPACT).encode("utf8")
+    flags = COMPRESSED if compress else 0
+    with open(path, "wb") as fd:
+        fd.write(HEADER.pack(MAGIC, VERSION, flags, len(header)))
+        fd.write(header)
+        for data in payloads:
+            fd.write(data)
+    return len(index)
+
+
+def unpack(path, directory, indent=4):
+    """
+    Write every theme in a bundle to its own json file.
+
+    Parameters
+    ----------
+    path : str or os.PathLike
+        the bundle file.
+    directory : str or os.PathLike
+        the directory receiving the theme files.
+    indent : int
+        indentation of the written json.
+
+    Returns
+    -------
+    int
+        the number of themes unpacked.
+    """
+    directory = Path(directory)
+    directory.mkdir(parents=True, exist_ok=True)
+    with ThemeBundle(path) as bundle:
+        for name in bundle.names():
+            theme_path = directory / (name + SUFFIX)
+            with open(theme_path, "wt", encoding="utf8") as fd:
+                json.dump(bundle.load(name), fd, indent=indent)
+        return len(bundle)
+
+
+class ThemeBundle:
+    """
+    Read only access to the themes in a bundle file.
+
+    Only the header is read when the bundle is opened, the file is memory
+    mapped and each theme is decoded when it is loaded.
+
+    Parameters
+    ----------
+    path : str or os.PathLike
+        the bundle file.
+    """
+
+    def __init__(self, path):
+        """Open the bundle and read its index."""
+        self.path = Path(path)
+        with open(self.path, "rb") as fd:
+            size = os.fstat(fd.fileno()).st_size
+            if size < HEADER.size:
+                raise BundleError(f"{path} is not a theme bundle")
+            self._map = mmap.mmap(fd.fileno(), 0, access=mmap.ACCESS_READ)
+        magic, version, flags, length = HEADER.unpack_from(self._map)
+        if magic != MAGIC or version != VERSION:
+            self.close()
+            raise BundleError(f"{path} is not a theme bundle")
+        self.compressed = bool(flags & COMPRESSED)
+        start = HEADER.size + length
+        index = json.loads(self._map[HEADER.size:start].decode("utf8"))
+        self.index = {
+            name: (start + offset, length) for name, offset, length in index
+        }
+
+    def names(self):
+        """Return the names of the themes in the bundle."""
+        return list(self.index)
+
+    def raw(self, name):
+        """Return the encoded payload of a theme."""
+        offset, length = self.index[name]
+        return self._map[offset:offset + length]
+
+    def load(self, name):
+        """
+        Decode a theme.
+
+        Parameters
+        ----------
+        name : str
+            the theme name.
+
+        Returns
+        -------
+        dict
+            the theme contents.
+        """
+        data = self.raw(name)
+        if self.compressed:
+            data = zlib.decompress(data)
+        return json.loads(data.decode("utf8"))
+
+    def close(self):
+        """Release the memory map."""
+        self._map.close()
+
+    def __contains__(self, name):
+        """Return True if the bundle holds a theme called `name`."""
+        return name in self.index
+
+    def __len__(self):
+        """Return the number of themes."""
+        return len(self.index)
+
+    def __enter__(self):
+        """Return the bundle for use in a with statement."""
+        return self
+
+    def __exit__(self, *_):
+        """Close the bundle at the end of a with statement."""
+        self.close()
+
+
+def open_bundle(path=BUNDLE):
+    """
+    Open a theme bundle if there is a valid one at `path`.
+
+    Parameters
+    ----------
+    path : str or os.PathLike
+        the bundle file, by default the one shipped next to the package.
+
+    Returns
+    -------
+    ThemeBundle or None
+        the opened bundle, or None when it is missing or invalid.
+    """
+    try:
+        return ThemeBundle(path)
+    except (OSError, ValueError, BundleError):
+        return None
+
+
+def main(args=None):
+    """Command line entry point for building and extracting bundles."""
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    commands = parser.add_subparsers(dest="command", required=True)
+    packer = commands.add_parser("pack", help="build a bundle")
+    packer.add_argument("directory")
+    packer.add_argument("bundle")
+    packer.add_argument("--compress", action="store_true")
+    unpacker = commands.add_parser("unpack", help="extract a bundle")
+    unpacker.add_argument("bundle")
+    unpacker.add_argument("directory")
+    options = parser.parse_args(args)
+    if options.command == "pack":
+        count = pack(options.directory, options.bundle, options.compress)
+    else:
+        count = unpack(options.bundle, options.directory)
+    print(f"{options.command}ed {count} themes")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,167 @@
+#! /usr/bin/python3
+# -*- coding: utf-8 -*-
+
+##############################################################################
+#  Copyright 2022 alexpdev
+#
+#  Licensed under the Apache License, Version 2.0 (the "License");
+#  you may not use this file except in compliance with the License.
+#  You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+#  Unless required by applicable law or agreed to in writing, software
+#  distributed under the License is distributed on an "AS IS" BASIS,
+#  WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#  See the License for the specific language governing permissions and
+#  limitations under the License.
+##############################################################################
+"""Content addressed cache for parsed style sheets."""
+
+import hashlib
+import sys
+import threading
+from collections import OrderedDict
+from typing import NamedTuple
+
+MAXSIZE = 32
+MAX_MEMORY = 64 << 20
+
+
+class CacheStats(NamedTuple):
+    """Counters describing the state of a cache."""
+
+    hits: int
+    misses: int
+    entries: int
+    memory: int
+    maxsize: int
+    max_memory: int
+
+
+def content_hash(text: str) -> bytes:
+    """Return a 128 bit digest of the style sheet `text`."""
+    return hashlib.blake2b(text.encode("utf-8"), digest_size=16).digest()
+
+
+class ParseCache:
+    """
+    Least recently used cache of values computed from style sheet text.
+
+    Entries are keyed by the content hash of the text and a `kind` tag so
+    different representations of the same sheet can be cached side by
+    side.  The memory of an entry is approximated by the size of the text
+    it was computed from.  Cached values are shared between callers and
+    must be treated as read only.  The cache may be used from several
+    threads; values are computed outside of the lock.
+
+    Parameters
+    ----------
+    maxsize : int
+        maximum number of entries.
+    max_memory : int
+        maximum combined size in bytes of the cached source texts.
+    """
+
+    def __init__(self, maxsize=MAXSIZE, max_memory=MAX_MEMORY):
+        """Construct an empty cache."""
+        self.maxsize = maxsize
+        self.max_memory = max_memory
+        self.hits = self.misses = self.memory = 0
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def fetch(self, text, kind, factory):
+        """
+        Return the cached value for `text`, computing it on a miss.
+
+        Parameters
+        ----------
+        text : str
+            the style sheet contents.
+        kind : str
+            name of the representation being cached.
+        factory : callable
+            called without arguments to compute the value on a miss.
+
+        Returns
+        -------
+        Any
+            the cached or newly computed value.
+        """
+        key = (kind, content_hash(text))
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                self.hits += 1
+                self._entries.move_to_end(key)
+                return entry[0]
+            self.misses += 1
+        value = factory()
+        size = sys.getsizeof(text)
+        with self._lock:
+            if key in self._entries:
+                return self._entries[key][0]
+            if size <= self.max_memory and self.maxsize > 0:
+                self._entries[key] = (value, size)
+                self.memory += size
+                self._trim()
+        return value
+
+    def resize(self, maxsize=None, max_memory=None):
+        """
+        Change the limits of the cache, evicting entries when needed.
+
+        Parameters
+        ----------
+        maxsize : int, optional
+            new maximum number of entries.
+        max_memory : int, optional
+            new maximum combined size in bytes.
+        """
+        with self._lock:
+            if maxsize is not None:
+                self.maxsize = maxsize
+            if max_memory is not None:
+                self.max_memory = max_memory
+            self._trim()
+
+    def clear(self):
+        """Remove every entry and reset the counters."""
+        with self._lock:
+            self._entries.clear()
+            self.hits = self.misses = self.memory = 0
+
+    def stats(self):
+        """
+        Return the hit and miss counters and the current usage.
+
+        Returns
+        -------
+        CacheStats
+            the cache statistics.
+        """
+        with self._lock:
+            return CacheStats(
+                self.hits,
+                self.misses,
+                len(self._entries),
+                self.memory,
+                self.maxsize,
+                self.max_memory,
+            )
+
+    def _fits(self):
+        """Return True when the cache is within its limits."""
+        if len(self._entries) > self.maxsize:
+            return False
+        return self.memory <= self.max_memory
+
+    def _trim(self):
+        """Evict the least recently used entries until within limits."""
+        while self._entries and not self._fits():
+            _, (_, size) = self._entries.popitem(last=False)
+            self.memory -= size
+
+
+parse_cache = ParseCache()
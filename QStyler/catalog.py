@@ -0,0 +1,269 @@
+#! /usr/bin/python3
+# -*- coding: utf-8 -*-
+
+##############################################################################
+#  Copyright 2022 alexpdev
+#
+#  Licensed under the Apache License, Version 2.0 (the "License");
+#  you may not use this file except in compliance with the License.
+#  You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+#  Unless required by applicable law or agreed to in writing, software
+#  distributed under the License is distributed on an "AS IS" BASIS,
+#  WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#  See the License for the specific language governing permissions and
+#  limitations under the License.
+##############################################################################
+"""Persistent index of the themes in a directory."""
+
+import hashlib
+import json
+import os
+from pathlib import Path
+from typing import NamedTuple
+
+from QStyler.persistence import write_atomic
+from QStyler.utils import get_cache_dir
+
+SUFFIX = ".json"
+
+
+def default_index_path(directory):
+    """Return the index file of a themes directory in the user cache."""
+    key = os.fsencode(os.path.abspath(directory))
+    digest = hashlib.blake2b(key, digest_size=8).hexdigest()
+    return get_cache_dir() / "catalogs" / f"{digest}.json"
+
+
+class ThemeEntry(NamedTuple):
+    """The indexed metadata of a theme file."""
+
+    name: str
+    path: str
+    size: int
+    mtime: int
+    rules: int
+    digest: str
+
+    def current(self, stat):
+        """Return True if `stat` describes the file this entry indexed."""
+        return self.size == stat.st_size and self.mtime == stat.st_mtime_ns
+
+
+class ThemeCatalog:
+    """
+    Map theme names to their files without scanning the directory.
+
+    The index is stored in the cache directory of the user, so read only
+    theme directories can be indexed too, and reused on the next start
+    as long as the modification time of the directory is unchanged.
+    Entries are checked against the modification time of their file when
+    looked up, so themes edited in place are re-indexed on demand.
+
+    Parameters
+    ----------
+    directory : str or os.PathLike
+        the themes directory.
+    index_path : str or os.PathLike, optional
+        where the index is stored, by default `default_index_path`.
+    scan : bool
+        bring the index up to date now, otherwise only the stored index is
+        read until `refresh` is called.
+    """
+
+    def __init__(self, directory, index_path=None, scan=True):
+        """Construct the catalog and bring it up to date."""
+        self.directory = Path(directory)
+        self.index_path = Path(index_path or default_index_path(directory))
+        self.entries = {}
+        self.mtime = None
+        self._load()
+        if scan:
+            self.refresh()
+
+    def _load(self):
+        """Read the stored index, ignoring a missing or corrupt file."""
+        try:
+            with open(self.index_path, "rt", encoding="utf8") as fd:
+                data = json.load(fd)
+            self.mtime = data["mtime"]
+            self.entries = {
+                entry[0]: ThemeEntry(*entry) for entry in data["themes"]
+            }
+        except (OSError, ValueError, KeyError, TypeError):
+            self.entries, self.mtime = {}, None
+
+    def save(self):
+        """Write the index to disk."""
+        data = {"mtime": self.mtime, "themes": list(self.entries.values())}
+        try:
+            self.index_path.parent.mkdir(parents=True, exist_ok=True)
+            write_atomic(self.index_path, data)
+        except OSError:  # pragma: nocover
+            pass
+
+    def refresh(self, force=False):
+        """
+        Re-index the files that changed since the index was written.
+
+        Parameters
+        ----------
+        force : bool
+            scan the directory even if its modification time is unchanged.
+
+        Returns
+        -------
+        bool
+            True if the index changed.  A missing directory has no themes.
+        """
+        try:
+            mtime = os.stat(self.directory).st_mtime_ns
+        except FileNotFoundError:
+            changed = bool(self.entries)
+            self.entries, self.mtime = {}, None
+            return changed
+        if mtime == self.mtime and not force:
+            return False
+        entries, changed = {}, mtime != self.mtime
+        with os.scandir(self.directory) as it:
+            for item in it:
+                name, ext = os.path.splitext(item.name)
+                if ext != SUFFIX or name.startswith(".") or not item.is_file():
+                    continue
+                entry = self.entries.get(name)
+                try:
+                    stale = entry is None or not entry.current(item.stat())
+                except OSError:
+                    continue
+                if stale:
+                    entry = self._index(name, item.path)
+                    changed = True
+                if entry is not None:
+                    entries[name] = entry
+        changed = changed or entries.keys() != self.entries.keys()
+        self.entries, self.mtime = entries, mtime
+        if changed:
+            self.save()
+        return changed
+
+    @staticmethod
+    def _index(name, path):
+        """
+        Read a theme file and return its entry.
+
+        A file that is not a valid json theme is indexed with no rules.
+        The digest is taken from the raw bytes, which matches the
+        `content_hash` of the text of any utf8 file.  None is returned
+        when the file can not be read.
+        """
+        try:
+            with open(path, "rb") as fd:
+                stat = os.fstat(fd.fileno())
+                data = fd.read()
+        except OSError:
+            return None
+        try:
+            rules = len(json.loads(data.decode("utf8")))
+        except (ValueError, TypeError):
+            rules = 0
+        return ThemeEntry(
+            name,
+            str(path),
+            stat.st_size,
+            stat.st_mtime_ns,
+            rules,
+            hashlib.blake2b(data, digest_size=16).hexdigest(),
+        )
+
+    def names(self):
+        """Return the names of every indexed theme."""
+        return list(self.entries)
+
+    def get(self, name):
+        """
+        Return the up to date entry of a theme.
+
+        Parameters
+        ----------
+        name : str
+            the theme name.
+
+        Returns
+        -------
+        ThemeEntry or None
+            the entry, or None if there is no such theme.
+        """
+        entry = self.entries.get(name)
+        if entry is None:
+            return None
+        try:
+            stat = os.stat(entry.path)
+        except OSError:
+            self.remove(name)
+            return None
+        if not entry.current(stat):
+            entry = self.update(name, entry.path)
+        return entry
+
+    def load(self, name):
+        """
+        Return the contents of a theme.
+
+        Parameters
+        ----------
+        name : str
+            the theme name.
+
+        Returns
+        -------
+        dict
+            the theme, empty if there is no such theme.
+        """
+        entry = self.get(name)
+        if entry is None:
+            return {}
+        with open(entry.path, "rt", encoding="utf8") as fd:
+            return json.load(fd)
+
+    def update(self, name, path=None):
+        """
+        Index a theme file that was created or modified.
+
+        Parameters
+        ----------
+        name : str
+            the theme name.
+        path : str or os.PathLike, optional
+            the theme file, by default ``<directory>/<name>.json``.
+
+        Returns
+        -------
+        ThemeEntry or None
+            the new entry, or None if the file can not be read and the
+            theme was dropped from the index.
+        """
+        path = path or self.directory / (name + SUFFIX)
+        entry = self._index(name, path)
+        if entry is None:
+            self.entries.pop(name, None)
+        else:
+            self.entries[name] = entry
+        self._sync()
+        return entry
+
+    def remove(self, name):
+        """Drop a theme from the index."""
+        if self.entries.pop(name, None) is not None:
+            self._sync()
+
+    def rename(self, old, new):
+        """Move the entry of a theme that was renamed."""
+        self.entries.pop(old, None)
+        self.update(new)
+
+    def _sync(self):
+        """Record the directory modification time and save the index."""
+        self.mtime = os.stat(self.directory).st_mtime_ns
+        self.save()
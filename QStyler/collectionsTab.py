@@ -20,17 +20,17 @@
 
 from PySide6.QtWidgets import (QLabel, QListWidget, QListWidgetItem,
                                QTableWidget, QTableWidgetItem, QTreeWidget,
-                               QTreeWidgetItem, QVBoxLayout, QWidget)
+                               QTreeWidgetItem, QVBoxLayout)
 
+from QStyler.lazy import LazyTab
 from QStyler.utils import Lorem
 
 
-class CollectionsTab(QWidget):
+class CollectionsTab(LazyTab):
     """Tab holding all of the widgets for example style will look like."""
 
-    def __init__(self, parent=None):
-        """Initialize the widgets tab."""
-        super().__init__(parent=parent)
+    def build(self):
+        """Build the widgets of the tab."""
         lorem = Lorem()
         self.vlayout = QVBoxLayout()
         self.setLayout(self.vlayout)
@@ -0,0 +1,85 @@
+#! /usr/bin/python3
+# -*- coding: utf-8 -*-
+
+##############################################################################
+#  Copyright 2022 alexpdev
+#
+#  Licensed under the Apache License, Version 2.0 (the "License");
+#  you may not use this file except in compliance with the License.
+#  You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+#  Unless required by applicable law or agreed to in writing, software
+#  distributed under the License is distributed on an "AS IS" BASIS,
+#  WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#  See the License for the specific language governing permissions and
+#  limitations under the License.
+##############################################################################
+"""Semantic differences between parsed style sheets."""
+
+from typing import NamedTuple
+
+
+class RuleDiff(NamedTuple):
+    """The selectors that differ between two parsed style sheets."""
+
+    added: tuple
+    removed: tuple
+    changed: tuple
+    reordered: bool = False
+
+    @property
+    def empty(self):
+        """Return True when both style sheets have the same effect."""
+        return not (
+            self.added or self.removed or self.changed or self.reordered
+        )
+
+    @property
+    def selectors(self):
+        """Return every selector whose rule was added, removed or changed."""
+        return self.added + self.removed + self.changed
+
+
+def diff_rules(old, new, sequences=None):
+    """
+    Compare two sets of parse results rule by rule.
+
+    Whitespace, comments and the grouping of selectors do not matter, only
+    the declarations each selector ends up with and the order of the
+    rules, which decides the cascade between equally specific selectors.
+
+    Parameters
+    ----------
+    old : dict
+        the results of the previous style sheet, or another mapping of
+        selectors to comparable values such as `IncrementalParser.cascade`.
+    new : dict
+        the results of the new style sheet.
+    sequences : tuple, optional
+        the old and new selectors of every rule block in document order,
+        such as `IncrementalParser.sequence`, by default the key order of
+        `old` and `new`.
+
+    Returns
+    -------
+    RuleDiff
+        the added, removed and changed selectors in document order.
+    """
+    added = tuple(selector for selector in new if selector not in old)
+    removed = tuple(selector for selector in old if selector not in new)
+    changed = []
+    for selector, props in new.items():
+        previous = old.get(selector)
+        if previous is None or previous is props:
+            continue
+        if previous != props:
+            changed.append(selector)
+    if sequences is None:
+        sequences = (old, new)
+    before, after = sequences
+    skip = set(changed)
+    common = [s for s in before if s in new and s not in skip]
+    reordered = common != [s for s in after if s in old and s not in skip]
+    return RuleDiff(added, removed, tuple(changed), reordered)
@@ -19,17 +19,17 @@
 """Widget tab module."""
 
 from PySide6.QtWidgets import (QLabel, QPlainTextEdit, QTextBrowser, QTextEdit,
-                               QVBoxLayout, QWidget)
+                               QVBoxLayout)
 
+from QStyler.lazy import LazyTab
 from QStyler.utils import Lorem
 
 
-class EditorsTab(QWidget):
+class EditorsTab(LazyTab):
     """Tab holding all of the widgets for example style will look like."""
 
-    def __init__(self, parent=None):
-        """Initialize the widgets tab."""
-        super().__init__(parent=parent)
+    def build(self):
+        """Build the widgets of the tab."""
         lorem = Lorem()
         self.vlayout = QVBoxLayout()
         self.setLayout(self.vlayout)
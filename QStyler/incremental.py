@@ -0,0 +1,327 @@
+#! /usr/bin/python3
+# -*- coding: utf-8 -*-
+
+##############################################################################
+#  Copyright 2022 alexpdev
+#
+#  Licensed under the Apache License, Version 2.0 (the "License");
+#  you may not use this file except in compliance with the License.
+#  You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+#  Unless required by applicable law or agreed to in writing, software
+#  distributed under the License is distributed on an "AS IS" BASIS,
+#  WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#  See the License for the specific language governing permissions and
+#  limitations under the License.
+##############################################################################
+"""Incremental qss parser that only re-parses the edited rule blocks."""
+
+from bisect import bisect_left, bisect_right
+from operator import attrgetter
+
+from QStyler.cache import parse_cache
+from QStyler.profiler import profiler
+from QStyler.tokenizer import Diagnostic, TokenizeError
+from QStyler.utils import QssParser
+
+
+class RuleBlock:
+    """A parsed rule block and the selectors it applies to."""
+
+    __slots__ = ("selectors", "props", "declarations", "closed", "order")
+
+    def __init__(self, selectors, props, closed=True, declarations=None):
+        """
+        Construct the rule block.
+
+        Parameters
+        ----------
+        selectors : tuple
+            the individual selectors of the group.
+        props : dict
+            the property names and values.
+        closed : bool
+            False when the block was ended by error recovery rather than
+            by its closing brace.
+        declarations : dict, optional
+            every declaration of the block, including the ``url()`` values
+            left out of `props`, by default `props`.
+        """
+        self.selectors = selectors
+        self.props = props
+        self.declarations = props if declarations is None else declarations
+        self.closed = closed
+        self.order = 0.0
+
+
+class IncrementalParser:
+    """
+    Keep the parse results of a document up to date as it is edited.
+
+    The parser keeps an index of the character span of every rule block.
+    Each edit only re-tokenizes the blocks that overlap the changed range
+    and the block that follows it.  The spans after the edit are stored
+    relative to a pending shift, so an edit only rewrites the spans
+    between it and the previous edit instead of every later span.
+
+    Besides `results`, which like `QssParser.results` keeps the last block
+    of each selector without ``url()`` declarations, the parser keeps the
+    `cascade` of every selector: all of its blocks in document order with
+    all of their declarations.  The key order of both mappings does not
+    follow the document, `sequence` gives the order of the blocks.
+
+    Parameters
+    ----------
+    text : str
+        the initial document contents.
+    """
+
+    def __init__(self, text=""):
+        """Construct the parser and index the initial text."""
+        self.blocks = []
+        self.starts = []
+        self.ends = []
+        self.errors = []
+        self.owners = {}
+        self.results = {}
+        self.cascade = {}
+        self.length = 0
+        self.shift_from = 0
+        self.shift = 0
+        self.reset(text)
+
+    @property
+    def valid(self):
+        """Return True when the last parsed document had no errors."""
+        return not self.errors
+
+    def sequence(self):
+        """
+        Return the selectors of every rule block in document order.
+
+        Returns
+        -------
+        tuple
+            each selector once for every block it appears in.
+        """
+        return tuple(
+            selector for block in self.blocks for selector in block.selectors
+        )
+
+    def diagnostics(self, text):
+        """
+        Return the problems found in the document.
+
+        Parameters
+        ----------
+        text : str
+            the document contents the parser is up to date with.
+
+        Returns
+        -------
+        list
+            a `Diagnostic` for every problem, in document order.
+        """
+        return [Diagnostic.from_error(text, err) for err in self.errors]
+
+    @classmethod
+    @profiler.timed("parse.index")
+    def index(cls, text):
+        """
+        Return the block index of the whole of `text`.
+
+        The index is computed without touching any parser state, so this
+        may be called from worker threads and the result passed to
+        `reset` later.
+
+        Parameters
+        ----------
+        text : str
+            the document contents.
+
+        Returns
+        -------
+        tuple
+            the blocks, their start and end offsets and the errors.
+        """
+        return parse_cache.fetch(
+            text, "blocks", lambda: cls._scan(text, 0, len(text))
+        )
+
+    def reset(self, text, index=None):
+        """
+        Discard the index and parse the whole of `text`.
+
+        Parameters
+        ----------
+        text : str
+            the document contents.
+        index : tuple, optional
+            a precomputed result of `index` for the same text.
+        """
+        self.blocks, self.starts, self.ends = [], [], []
+        self.owners, self.results, self.cascade = {}, {}, {}
+        self.length = len(text)
+        self.shift_from, self.shift = 0, 0
+        if index is None:
+            index = self.index(text)
+        blocks, starts, ends, errors = index
+        self.errors = list(errors)
+        self._splice(0, 0, blocks, starts, ends)
+
+    @profiler.timed("parse.incremental")
+    def update(self, text, position, removed, added):
+        """
+        Apply an edit reported by ``QTextDocument.contentsChange``.
+
+        Parameters
+        ----------
+        text : str
+            the document contents after the edit.
+        position : int
+            offset where the edit begins.
+        removed : int
+            number of characters removed.
+        added : int
+            number of characters added.
+        """
+        if position + added > len(text):
+            self.reset(text)
+            return
+        delta = len(text) - self.length
+        old_end = min(position + removed, self.length)
+        total = len(self.blocks)
+        first = self._bisect(bisect_left, self.ends, position)
+        while first and not self.blocks[first - 1].closed:
+            first -= 1
+        last = self._bisect(bisect_right, self.starts, old_end)
+        last = min(last + 1, total)
+        while last < total and not self.blocks[last - 1].closed:
+            last += 1
+        while True:
+            lo = self._offset(self.ends, first - 1) if first else 0
+            hi = self.length
+            if last < total:
+                hi = self._offset(self.ends, last - 1)
+            blocks, starts, ends, errors = self._scan(text, lo, hi + delta)
+            if last == total or not any(err.incomplete for err in errors):
+                break
+            last = min(total, last + max(1, last - first))
+            while last < total and not self.blocks[last - 1].closed:
+                last += 1
+        self.length = len(text)
+        self._shift_errors(lo, hi if last < total else None, delta, errors)
+        self._settle(last)
+        self.shift += delta
+        self._splice(first, last, blocks, starts, ends)
+
+    def _offset(self, offsets, index):
+        """Return the document offset stored at `index` of `offsets`."""
+        if index >= self.shift_from:
+            return offsets[index] + self.shift
+        return offsets[index]
+
+    def _bisect(self, search, offsets, position):
+        """Bisect `offsets` for a document offset with `search`."""
+        split = self.shift_from
+        index = search(offsets, position, 0, split)
+        if index < split:
+            return index
+        return search(offsets, position - self.shift, split)
+
+    def _settle(self, index):
+        """Make the pending shift start at block `index`."""
+        start, shift = self.shift_from, self.shift
+        if index < start:
+            start, end, shift = index, start, -shift
+        else:
+            end = index
+        if shift:
+            for i in range(start, end):
+                self.starts[i] += shift
+                self.ends[i] += shift
+        self.shift_from = index
+
+    def _number(self, first, last):
+        """Give the blocks `first` to `last` keys that follow their order."""
+        low = self.blocks[first - 1].order if first else 0.0
+        if last < len(self.blocks):
+            high = self.blocks[last].order
+        else:
+            high = low + last - first + 1
+        step = (high - low) / (last - first + 1)
+        keys = [low + step * i for i in range(1, last - first + 1)]
+        bounds = [low] + keys + [high]
+        if all(a < b for a, b in zip(bounds, bounds[1:])):
+            for block, key in zip(self.blocks[first:last], keys):
+                block.order = key
+        else:
+            for key, block in enumerate(self.blocks, 1):
+                block.order = float(key)
+
+    @staticmethod
+    def _scan(text, start, end):
+        """Parse the rule blocks located between `start` and `end`."""
+        blocks, starts, ends, errors = [], [], [], []
+        region = text[start:end]
+        for group, declarations, span in QssParser.rule_blocks(
+            region, start, errors, urls=True
+        ):
+            selectors = tuple(QssParser.split_selectors(group))
+            closed = region[span[1] - start - 1:span[1] - start] == "}"
+            props = declarations
+            if any("url" in value for value in declarations.values()):
+                props = {
+                    key: value
+                    for key, value in declarations.items()
+                    if "url" not in value
+                }
+            blocks.append(RuleBlock(selectors, props, closed, declarations))
+            starts.append(span[0])
+            ends.append(span[1])
+        return blocks, starts, ends, tuple(errors)
+
+    def _shift_errors(self, lo, hi, delta, errors):
+        """Replace the errors of a re-parsed region and move later ones."""
+        before = [err for err in self.errors if err.position < lo]
+        after = []
+        if hi is not None:
+            after = [
+                TokenizeError(err.message, err.position + delta)
+                for err in self.errors
+                if err.position >= hi
+            ]
+        self.errors = before + list(errors) + after
+
+    def _splice(self, first, last, blocks, starts, ends):
+        """Replace the blocks in range `first` to `last` with new ones."""
+        touched = set()
+        for block in self.blocks[first:last]:
+            for selector in block.selectors:
+                self.owners[selector].remove(block)
+                touched.add(selector)
+        self.blocks[first:last] = blocks
+        self.starts[first:last] = starts
+        self.ends[first:last] = ends
+        if self.shift_from >= last:
+            self.shift_from += len(blocks) - (last - first)
+        self._number(first, first + len(blocks))
+        for block in blocks:
+            for selector in block.selectors:
+                self.owners.setdefault(selector, []).append(block)
+                touched.add(selector)
+        for selector in touched:
+            owners = self.owners[selector]
+            if not owners:
+                del self.owners[selector]
+                del self.results[selector]
+                del self.cascade[selector]
+                continue
+            if len(owners) > 1:
+                owners.sort(key=attrgetter("order"))
+            self.results[selector] = dict(owners[-1].props)
+            self.cascade[selector] = tuple(
+                block.declarations for block in owners
+            )
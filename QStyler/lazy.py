@@ -0,0 +1,64 @@
+#! /usr/bin/python3
+# -*- coding: utf-8 -*-
+
+##############################################################################
+#  Copyright 2022 alexpdev
+#
+#  Licensed under the Apache License, Version 2.0 (the "License");
+#  you may not use this file except in compliance with the License.
+#  You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+#  Unless required by applicable law or agreed to in writing, software
+#  distributed under the License is distributed on an "AS IS" BASIS,
+#  WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#  See the License for the specific language governing permissions and
+#  limitations under the License.
+##############################################################################
+"""Tabs that build their contents the first time they are shown."""
+
+from PySide6.QtCore import Signal
+from PySide6.QtWidgets import QWidget
+
+from QStyler.profiler import profiler
+
+
+class LazyTab(QWidget):
+    """
+    Placeholder tab that builds its widgets when it is first shown.
+
+    Until then the tab has no children, so creating the window and
+    restyling the application skip its widgets entirely.  Subclasses
+    create their contents in `build`.
+
+    Parameters
+    ----------
+    parent : QWidget, optional
+        the parent of the widget, by default None
+    """
+
+    built = Signal()
+
+    def __init__(self, parent=None):
+        """Construct the empty tab."""
+        super().__init__(parent=parent)
+        self.is_built = False
+
+    def build(self):
+        """Create the contents of the tab, the base tab stays empty."""
+
+    def ensure_built(self):
+        """Build the contents if that has not happened yet."""
+        if not self.is_built:
+            self.is_built = True
+            with profiler.span("tab.build"):
+                self.build()
+            self.built.emit()
+        return self
+
+    def setVisible(self, visible):
+        """Build the contents before the tab is shown."""
+        if visible:
+            self.ensure_built()
+        super().setVisible(visible)
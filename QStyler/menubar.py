@@ -51,6 +51,8 @@ class MenuBar(QMenuBar):
         self.window = parent
         self.fileMenu = FileMenu("File", parent=self)
         self.fileMenu.displayStyles.connect(self.displayStyles)
+        self.fileMenu.latencyToggled.connect(self.window.show_latency)
+        self.fileMenu.exportTraceClicked.connect(self.window.export_trace)
         self.optionsMenu = ThemeMenu("Themes", parent=self)
         self.helpMenu = HelpMenu("Help", parent=self)
         self.addMenu(self.fileMenu)
@@ -159,6 +161,9 @@ class FileMenu(QMenu):
     """
 
     displayStyles = Signal()
+    latencyToggled = Signal(bool)
+    exportTraceClicked = Signal()
+    exportResourceClicked = Signal()
 
     def __init__(self, text: str, parent=None) -> None:
         """
@@ -174,6 +179,17 @@ class FileMenu(QMenu):
         super().__init__(text, parent=parent)
         self.exitAction = QAction("Exit")
         self.saveAction = QAction("Save")
+        self.latencyAction = QAction("Show Latency")
+        self.traceAction = QAction("Export Trace")
+        self.resourceAction = QAction("Export Resource")
+        self.latencyAction.setCheckable(True)
         self.exitAction.triggered.connect(exitApp)
+        self.latencyAction.toggled.connect(self.latencyToggled.emit)
+        self.traceAction.triggered.connect(self.exportTraceClicked.emit)
+        self.resourceAction.triggered.connect(self.exportResourceClicked.emit)
         self.addAction(self.exitAction)
         self.addAction(self.saveAction)
+        self.addSeparator()
+        self.addAction(self.latencyAction)
+        self.addAction(self.traceAction)
+        self.addAction(self.resourceAction)
@@ -0,0 +1,185 @@
+#! /usr/bin/python3
+# -*- coding: utf-8 -*-
+
+##############################################################################
+#  Copyright 2022 alexpdev
+#
+#  Licensed under the Apache License, Version 2.0 (the "License");
+#  you may not use this file except in compliance with the License.
+#  You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+#  Unless required by applicable law or agreed to in writing, software
+#  distributed under the License is distributed on an "AS IS" BASIS,
+#  WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#  See the License for the specific language governing permissions and
+#  limitations under the License.
+##############################################################################
+"""Compact object model for style sheets."""
+
+import json
+import sys
+from weakref import WeakValueDictionary
+
+from QStyler.utils import get_src_dir
+
+
+def _load_vocabulary():
+    """Return the interned property and pseudo-state names in data.json."""
+    path = get_src_dir() / "data" / "data.json"
+    with open(path, "rt", encoding="utf8") as fd:
+        data = json.load(fd)
+    names = set(data["properties"])
+    for states in data["states"].values():
+        names.update(states)
+    for controls in data["controls"].values():
+        names.update(controls)
+    names.update(data["controls"])
+    return {name: sys.intern(name) for name in names}
+
+
+VOCABULARY = _load_vocabulary()
+
+
+def intern_name(name: str) -> str:
+    """Return the shared instance of a property, state or selector name."""
+    return VOCABULARY.get(name) or sys.intern(name)
+
+
+class Declaration:
+    """
+    A single property and its value.
+
+    Declarations are shared between every rule that uses the same
+    property and value, and must not be modified.
+
+    Parameters
+    ----------
+    name : str
+        the property name.
+    value : str
+        the property value.
+    """
+
+    __slots__ = ("name", "value", "__weakref__")
+
+    _shared = WeakValueDictionary()
+
+    def __init__(self, name, value):
+        """Construct the declaration."""
+        self.name = name
+        self.value = value
+
+    @classmethod
+    def get(cls, name, value):
+        """Return the shared declaration for `name` and `value`."""
+        key = (intern_name(name), sys.intern(value))
+        declaration = cls._shared.get(key)
+        if declaration is None:
+            declaration = cls(*key)
+            cls._shared[key] = declaration
+        return declaration
+
+    def __repr__(self):
+        """Return the representation of the declaration."""
+        return f"{self.name}: {self.value};"
+
+
+class Rule:
+    """
+    A selector and its declarations.
+
+    Parameters
+    ----------
+    selector : str
+        the selector the rule applies to.
+    declarations : tuple
+        the declarations of the rule in source order.
+    """
+
+    __slots__ = ("selector", "declarations")
+
+    def __init__(self, selector, declarations):
+        """Construct the rule."""
+        self.selector = selector
+        self.declarations = declarations
+
+    @classmethod
+    def from_dict(cls, selector, props):
+        """Build a rule from a selector and a mapping of properties."""
+        declarations = tuple(
+            Declaration.get(name, value) for name, value in props.items()
+        )
+        return cls(intern_name(selector), declarations)
+
+    def to_dict(self):
+        """Return the properties of the rule as a dictionary."""
+        return {d.name: d.value for d in self.declarations}
+
+    def __repr__(self):
+        """Return the representation of the rule."""
+        return f"Rule({self.selector!r}, {len(self.declarations)})"
+
+
+class Stylesheet:
+    """
+    An ordered collection of rules.
+
+    Parameters
+    ----------
+    rules : tuple
+        the rules of the style sheet in source order.
+    """
+
+    __slots__ = ("rules",)
+
+    def __init__(self, rules=()):
+        """Construct the style sheet."""
+        self.rules = tuple(rules)
+
+    @classmethod
+    def from_dict(cls, theme):
+        """
+        Build a style sheet from the theme dictionary format.
+
+        Parameters
+        ----------
+        theme : dict
+            selectors mapped to dictionaries of properties, as stored in
+            theme files and returned by `QssParser.results`.
+
+        Returns
+        -------
+        Stylesheet
+            the compact style sheet.
+        """
+        return cls(
+            Rule.from_dict(selector, props)
+            for selector, props in theme.items()
+        )
+
+    @classmethod
+    def load(cls, path):
+        """Read a theme json file into a style sheet."""
+        with open(path, "rt", encoding="utf8") as fd:
+            return cls.from_dict(json.load(fd))
+
+    def to_dict(self):
+        """
+        Convert the style sheet back into the theme dictionary format.
+
+        Returns
+        -------
+        dict
+            selectors mapped to dictionaries of properties.
+        """
+        return {rule.selector: rule.to_dict() for rule in self.rules}
+
+    def __iter__(self):
+        """Iterate over the rules."""
+        return iter(self.rules)
+
+    def __len__(self):
+        """Return the number of rules."""
+        return len(self.rules)
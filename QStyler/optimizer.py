@@ -0,0 +1,298 @@
+#! /usr/bin/python3
+# -*- coding: utf-8 -*-
+
+##############################################################################
+#  Copyright 2022 alexpdev
+#
+#  Licensed under the Apache License, Version 2.0 (the "License");
+#  you may not use this file except in compliance with the License.
+#  You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+#  Unless required by applicable law or agreed to in writing, software
+#  distributed under the License is distributed on an "AS IS" BASIS,
+#  WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#  See the License for the specific language governing permissions and
+#  limitations under the License.
+##############################################################################
+"""
+Shrink parsed themes without changing how they style widgets.
+
+Optimize a directory of themes with ``python -m QStyler.optimizer DIR``,
+optionally writing the results elsewhere with ``--output OUT``.
+"""
+
+import argparse
+import functools
+import json
+import sys
+from pathlib import Path
+from typing import NamedTuple
+
+from PySide6 import QtWidgets
+
+from QStyler.persistence import write_atomic
+from QStyler.scope import selector_subject
+from QStyler.utils import QssParser, parse_stylesheet
+
+
+class Optimization(NamedTuple):
+    """Size of a theme before and after optimizing it."""
+
+    name: str
+    rules: int
+    declarations: int
+    optimized_rules: int
+    optimized_declarations: int
+
+
+@functools.lru_cache(maxsize=None)
+def _overlap(first, second):
+    """Return True if two selector subjects can match the same widget."""
+    (cls_a, ident_a), (cls_b, ident_b) = first, second
+    if ident_a and ident_b and ident_a != ident_b:
+        return False
+    if cls_a is None or cls_b is None or cls_a == cls_b:
+        return True
+    type_a = getattr(QtWidgets, cls_a, None)
+    type_b = getattr(QtWidgets, cls_b, None)
+    if not isinstance(type_a, type) or not isinstance(type_b, type):
+        return True
+    return issubclass(type_a, type_b) or issubclass(type_b, type_a)
+
+
+def _roots(props):
+    """
+    Return the property families of `props`.
+
+    Shorthands and their longhands share the name before the first dash,
+    such as ``border`` for ``border-color`` and ``border-top-color``,
+    so two properties of one family may set the same value.
+    """
+    return {prop.split("-", 1)[0] for prop in props}
+
+
+class _Rule:
+    """Selectors sharing one declaration block while optimizing."""
+
+    __slots__ = ("selectors", "props", "subjects", "roots")
+
+    def __init__(self, selector, props):
+        """Construct the rule for a single selector."""
+        self.selectors = [selector]
+        self.props = props
+        self.subjects = {selector_subject(selector)}
+        self.roots = None
+
+    def add(self, selector):
+        """Add a selector to the group."""
+        self.selectors.append(selector)
+        self.subjects.add(selector_subject(selector))
+
+    def conflicts(self, other):
+        """Return True if reordering the two rules could change a style."""
+        if self.roots is None:
+            self.roots = _roots(self.props)
+        if other.roots is None:
+            other.roots = _roots(other.props)
+        if self.roots.isdisjoint(other.roots):
+            return False
+        return any(
+            _overlap(a, b) for a in self.subjects for b in other.subjects
+        )
+
+
+def _movable(rule, rules):
+    """Return True if `rule` can be moved in front of every one of `rules`."""
+    return not any(rule.conflicts(other) for other in rules)
+
+
+def _expand(blocks):
+    """Return the single selector rules of the blocks in cascade order."""
+    rules = []
+    for group, props in blocks:
+        for selector in QssParser.split_selectors(group):
+            if selector:
+                rules.append((" ".join(selector.split()), dict(props)))
+    return rules
+
+
+def _drop_overridden(rules):
+    """Remove declarations set again by a later rule for the selector."""
+    later = {}
+    for selector, props in reversed(rules):
+        seen = later.setdefault(selector, set())
+        for prop in [prop for prop in props if prop in seen]:
+            del props[prop]
+        seen.update(props)
+
+
+def _merge(rules):
+    """Fold rules for a selector seen before into the earlier rule."""
+    merged, position = [], {}
+    for selector, props in rules:
+        rule = _Rule(selector, props)
+        index = position.get(selector)
+        if index is not None and _movable(rule, merged[index + 1:]):
+            merged[index].props.update(props)
+            merged[index].roots = None
+        else:
+            position[selector] = len(merged)
+            merged.append(rule)
+    return merged
+
+
+def _regroup(rules):
+    """Group selectors with identical declaration blocks."""
+    grouped, position = [], {}
+    for rule in rules:
+        key = tuple(rule.props.items())
+        index = position.get(key)
+        if index is not None and _movable(rule, grouped[index + 1:]):
+            grouped[index].add(rule.selectors[0])
+        else:
+            position[key] = len(grouped)
+            grouped.append(rule)
+    return grouped
+
+
+def _optimize(blocks):
+    """Optimize selector groups and properties given in cascade order."""
+    rules = _expand(blocks)
+    _drop_overridden(rules)
+    merged = [rule for rule in _merge(rules) if rule.props]
+    return [
+        (", ".join(rule.selectors), rule.props) for rule in _regroup(merged)
+    ]
+
+
+def optimize(theme):
+    """
+    Return a smaller theme that styles widgets the same way.
+
+    Declarations that a later rule for the same selector sets again are
+    removed, repeated selectors are folded into one rule, empty rules are
+    dropped and selectors with identical declaration blocks are grouped
+    into a single comma separated rule.  Rules are only moved in front of
+    others when none of those could style the same widget with a property
+    of the same family, such as ``border`` and ``border-top-color``, so
+    the cascade order that matters is preserved.
+
+    Parameters
+    ----------
+    theme : dict
+        selectors, or selector groups, mapped to dictionaries of
+        properties, such as `QssParser.results`.
+
+    Returns
+    -------
+    list
+        the optimized (selector group, properties) rules in cascade order.
+        A selector may appear in more than one rule when a rule between
+        them keeps the blocks apart, see `as_theme`.
+    """
+    return _optimize(theme.items())
+
+
+def as_theme(rules):
+    """
+    Return optimized rules as a theme dictionary if that loses nothing.
+
+    Parameters
+    ----------
+    rules : list
+        (selector group, properties) pairs, as returned by `optimize`.
+
+    Returns
+    -------
+    dict or None
+        the theme, or None when a selector group is repeated and a
+        dictionary would drop one of its rules.
+    """
+    theme = dict(rules)
+    return theme if len(theme) == len(rules) else None
+
+
+def optimize_stylesheet(text):
+    """
+    Parse qss text and return the optimized theme.
+
+    Unlike `QssParser.results`, which keeps only the last block for a
+    repeated selector and skips ``url()`` declarations, every block of
+    the text takes part in the cascade with all of its declarations.
+
+    Parameters
+    ----------
+    text : str
+        the style sheet contents.
+
+    Returns
+    -------
+    list
+        the optimized rules, see `optimize`.
+    """
+    return _optimize(parse_stylesheet(text, urls=True).rules())
+
+
+def measure(theme):
+    """Return the number of rules and declarations Qt parses for a theme."""
+    rules = declarations = 0
+    blocks = theme.items() if isinstance(theme, dict) else theme
+    for _, props in blocks:
+        if props:
+            rules += 1
+            declarations += len(props)
+    return rules, declarations
+
+
+def optimize_directory(directory, output=None):
+    """
+    Optimize every json theme in a directory.
+
+    Parameters
+    ----------
+    directory : str or os.PathLike
+        the themes directory.
+    output : str or os.PathLike, optional
+        where the optimized themes are written, by default over the
+        originals.
+
+    Returns
+    -------
+    list
+        an `Optimization` for every theme.  Themes whose optimized rules
+        cannot be stored as a json object are written unchanged.
+    """
+    output = Path(output or directory)
+    output.mkdir(parents=True, exist_ok=True)
+    report = []
+    for path in sorted(Path(directory).glob("*.json")):
+        with open(path, "rt", encoding="utf8") as fd:
+            theme = json.load(fd)
+        optimized = as_theme(optimize(theme))
+        if optimized is None:
+            optimized = theme
+        write_atomic(output / path.name, optimized)
+        report.append(
+            Optimization(path.stem, *measure(theme), *measure(optimized))
+        )
+    return report
+
+
+def main(args=None):
+    """Command line entry point for optimizing themes."""
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("directory")
+    parser.add_argument("--output", help="directory for optimized themes")
+    options = parser.parse_args(args)
+    for item in optimize_directory(options.directory, options.output):
+        print(
+            f"{item.name:<32} {item.declarations:>6} -> "
+            f"{item.optimized_declarations:>6} declarations"
+        )
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,144 @@
+#! /usr/bin/python3
+# -*- coding: utf-8 -*-
+
+##############################################################################
+#  Copyright 2022 alexpdev
+#
+#  Licensed under the Apache License, Version 2.0 (the "License");
+#  you may not use this file except in compliance with the License.
+#  You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+#  Unless required by applicable law or agreed to in writing, software
+#  distributed under the License is distributed on an "AS IS" BASIS,
+#  WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#  See the License for the specific language governing permissions and
+#  limitations under the License.
+##############################################################################
+"""Background, atomic writing of theme files."""
+
+import json
+import os
+import stat
+import tempfile
+import threading
+
+from PySide6.QtCore import QCoreApplication, QObject, QThreadPool, Signal
+
+
+def _umask():
+    """Return the file mode creation mask of the process."""
+    mask = os.umask(0)
+    os.umask(mask)
+    return mask
+
+
+UMASK = _umask()
+
+
+def write_atomic(path, theme):
+    """
+    Write a theme to `path` so readers never see a partial file.
+
+    The json is written to a temporary file in the same directory, flushed
+    to disk and moved over `path` with `os.replace`.  The file keeps the
+    permissions of the file it replaces, new files get the permissions
+    `open` would give them.
+
+    Parameters
+    ----------
+    path : str or os.PathLike
+        the theme file.
+    theme : dict
+        the theme contents.
+    """
+    directory, name = os.path.split(os.fspath(path))
+    fd, temp = tempfile.mkstemp(
+        dir=directory or ".", prefix="." + name, suffix=".tmp"
+    )
+    try:
+        mode = stat.S_IMODE(os.stat(path).st_mode)
+    except OSError:
+        mode = 0o666 & ~UMASK
+    try:
+        with os.fdopen(fd, "wt", encoding="utf8") as handle:
+            json.dump(theme, handle, indent=4)
+            handle.flush()
+            os.fsync(handle.fileno())
+        os.chmod(temp, mode)
+        os.replace(temp, path)
+    except BaseException:
+        os.remove(temp)
+        raise
+
+
+class ThemeWriter(QObject):
+    """
+    Save themes on a background thread.
+
+    Writes happen one at a time in the order they were requested.  When a
+    file is saved again before its previous write started, only the
+    newest contents are written.
+
+    Parameters
+    ----------
+    parent : QObject, optional
+        parent object, by default None
+    """
+
+    saved = Signal(str, str)
+    failed = Signal(str, str)
+    _finished = Signal(str, str, str)
+
+    def __init__(self, parent=None):
+        """Construct the writer and its thread."""
+        super().__init__(parent)
+        self.pool = QThreadPool(self)
+        self.pool.setMaxThreadCount(1)
+        self.pending = {}
+        self._lock = threading.Lock()
+        self._finished.connect(self._report)
+
+    def save(self, name, path, theme):
+        """
+        Queue a theme to be written.
+
+        Parameters
+        ----------
+        name : str
+            the theme name, reported back through `saved`.
+        path : str or os.PathLike
+            the theme file.
+        theme : dict
+            the theme contents, which must not be modified afterwards.
+        """
+        path = os.fspath(path)
+        with self._lock:
+            queued = path in self.pending
+            self.pending[path] = (name, theme)
+        if not queued:
+            self.pool.start(lambda: self._write(path))
+
+    def flush(self):
+        """Block until every queued theme is written and reported."""
+        self.pool.waitForDone()
+        QCoreApplication.sendPostedEvents(self)
+
+    def _write(self, path):
+        """Write the newest contents queued for `path`."""
+        with self._lock:
+            name, theme = self.pending.pop(path)
+        try:
+            write_atomic(path, theme)
+        except (OSError, TypeError, ValueError) as err:
+            self._finished.emit(name, path, str(err))
+        else:
+            self._finished.emit(name, path, "")
+
+    def _report(self, name, path, error):
+        """Emit the outcome of a write on the thread owning the writer."""
+        if error:
+            self.failed.emit(path, error)
+        else:
+            self.saved.emit(name, path)
@@ -0,0 +1,244 @@
+#! /usr/bin/python3
+# -*- coding: utf-8 -*-
+
+##############################################################################
+#  Copyright 2022 alexpdev
+#
+#  Licensed under the Apache License, Version 2.0 (the "License");
+#  you may not use this file except in compliance with the License.
+#  You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+#  Unless required by applicable law or agreed to in writing, software
+#  distributed under the License is distributed on an "AS IS" BASIS,
+#  WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#  See the License for the specific language governing permissions and
+#  limitations under the License.
+##############################################################################
+"""Latency instrumentation for the parse, apply and theme load paths."""
+
+import functools
+import json
+import os
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager, nullcontext
+
+WINDOW = 1024
+MAX_EVENTS = 100000
+PERCENTILES = (50, 95, 99)
+
+_DISABLED = nullcontext()
+
+
+class Profiler:
+    """
+    Record the duration of instrumented operations.
+
+    Durations are kept per operation name in a rolling window from which
+    percentiles are computed, and as trace events that can be exported
+    for ``chrome://tracing`` or Perfetto.  While disabled the hooks only
+    check a flag.
+
+    Parameters
+    ----------
+    enabled : bool
+        start recording immediately.
+    window : int
+        number of recent durations kept per operation.
+    """
+
+    def __init__(self, enabled=False, window=WINDOW):
+        """Construct the profiler."""
+        self.enabled = enabled
+        self.window = window
+        self.samples = {}
+        self.events = deque(maxlen=MAX_EVENTS)
+        self.origin = time.perf_counter()
+        self._lock = threading.Lock()
+
+    def record(self, name, start, end):
+        """
+        Store one measured operation.
+
+        Parameters
+        ----------
+        name : str
+            the operation name.
+        start : float
+            ``time.perf_counter`` value when the operation began.
+        end : float
+            ``time.perf_counter`` value when the operation ended.
+        """
+        with self._lock:
+            samples = self.samples.get(name)
+            if samples is None:
+                samples = self.samples[name] = deque(maxlen=self.window)
+            samples.append(end - start)
+            self.events.append((name, start, end, threading.get_ident()))
+
+    @contextmanager
+    def _measure(self, name):
+        """Time the body of a with statement."""
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.record(name, start, time.perf_counter())
+
+    def span(self, name):
+        """
+        Return a context manager timing its body as operation `name`.
+
+        Parameters
+        ----------
+        name : str
+            the operation name.
+
+        Returns
+        -------
+        contextmanager
+            a no-op context when the profiler is disabled.
+        """
+        if not self.enabled:
+            return _DISABLED
+        return self._measure(name)
+
+    def timed(self, name):
+        """
+        Decorate a function so every call is timed as operation `name`.
+
+        Parameters
+        ----------
+        name : str
+            the operation name.
+
+        Returns
+        -------
+        callable
+            the decorator.
+        """
+
+        def decorator(func):
+            @functools.wraps(func)
+            def wrapper(*args, **kwargs):
+                if not self.enabled:
+                    return func(*args, **kwargs)
+                with self._measure(name):
+                    return func(*args, **kwargs)
+
+            return wrapper
+
+        return decorator
+
+    def percentiles(self, name):
+        """
+        Return the p50, p95 and p99 durations of an operation.
+
+        Parameters
+        ----------
+        name : str
+            the operation name.
+
+        Returns
+        -------
+        dict
+            percentile labels mapped to seconds, empty if never recorded.
+        """
+        with self._lock:
+            samples = sorted(self.samples.get(name, ()))
+        if not samples:
+            return {}
+        last = len(samples) - 1
+        return {
+            f"p{p}": samples[min(last, len(samples) * p // 100)]
+            for p in PERCENTILES
+        }
+
+    def summary(self):
+        """
+        Return the percentiles of every recorded operation.
+
+        Returns
+        -------
+        dict
+            operation names mapped to their percentiles and sample count.
+        """
+        with self._lock:
+            names = {name: len(s) for name, s in self.samples.items()}
+        summary = {}
+        for name, count in sorted(names.items()):
+            summary[name] = dict(self.percentiles(name), count=count)
+        return summary
+
+    def describe(self, name):
+        """
+        Return a one line summary of the percentiles of an operation.
+
+        Parameters
+        ----------
+        name : str
+            the operation name.
+
+        Returns
+        -------
+        str
+            the p50, p95 and p99 durations in milliseconds.
+        """
+        values = self.percentiles(name)
+        if not values:
+            return f"{name} -"
+        timings = "/".join(f"{v * 1000:.1f}" for v in values.values())
+        return f"{name} {timings} ms"
+
+    def trace_events(self):
+        """
+        Return the recorded operations as Chrome trace events.
+
+        Returns
+        -------
+        dict
+            a trace document in the Trace Event Format.
+        """
+        with self._lock:
+            events = list(self.events)
+        pid = os.getpid()
+        return {
+            "traceEvents": [
+                {
+                    "name": name,
+                    "cat": name.split(".")[0],
+                    "ph": "X",
+                    "ts": (start - self.origin) * 1e6,
+                    "dur": (end - start) * 1e6,
+                    "pid": pid,
+                    "tid": tid,
+                }
+                for name, start, end, tid in events
+            ],
+            "displayTimeUnit": "ms",
+        }
+
+    def export_trace(self, path):
+        """
+        Write the recorded operations to a Chrome trace json file.
+
+        Parameters
+        ----------
+        path : str or os.PathLike
+            the output file.
+        """
+        with open(path, "wt", encoding="utf8") as fd:
+            json.dump(self.trace_events(), fd)
+
+    def reset(self):
+        """Forget every recorded operation."""
+        with self._lock:
+            self.samples.clear()
+            self.events.clear()
+            self.origin = time.perf_counter()
+
+
+profiler = Profiler(enabled=bool(os.environ.get("QSTYLER_PROFILE")))
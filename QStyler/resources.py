@@ -0,0 +1,211 @@
+#! /usr/bin/python3
+# -*- coding: utf-8 -*-
+
+##############################################################################
+#  Copyright 2022 alexpdev
+#
+#  Licensed under the Apache License, Version 2.0 (the "License");
+#  you may not use this file except in compliance with the License.
+#  You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+#  Unless required by applicable law or agreed to in writing, software
+#  distributed under the License is distributed on an "AS IS" BASIS,
+#  WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#  See the License for the specific language governing permissions and
+#  limitations under the License.
+##############################################################################
+"""
+Export themes as compiled Qt resource files.
+
+Export a theme with ``python -m QStyler.resources THEME.json OUT.rcc``.
+Next to ``OUT.rcc`` a python module is generated whose ``load`` function
+registers the resource and applies the theme.
+"""
+
+import argparse
+import json
+import os
+import re
+import shutil
+import subprocess
+import sys
+import tempfile
+from pathlib import Path
+from xml.sax.saxutils import escape, quoteattr
+
+import PySide6
+
+from QStyler.optimizer import optimize, optimize_stylesheet
+from QStyler.utils import json_to_stylesheet
+
+PREFIX = "/qstyler"
+STYLESHEET = "theme.qss"
+_URL = re.compile(r"url\(\s*(['\"]?)(.*?)\1\s*\)")
+
+LOADER = '''"""Load the {name} theme exported by QStyler."""
+
+from pathlib import Path
+
+from PySide6.QtCore import QFile, QIODevice, QResource
+from PySide6.QtWidgets import QApplication
+
+RESOURCE = Path(__file__).with_name({resource!r})
+STYLESHEET = {stylesheet!r}
+
+
+def load(app=None):
+    """Register the resource and apply the theme to `app`."""
+    if not QResource.registerResource(str(RESOURCE)):
+        raise RuntimeError(f"could not register {{RESOURCE}}")
+    fd = QFile(STYLESHEET)
+    fd.open(QIODevice.OpenModeFlag.ReadOnly)
+    text = bytes(fd.readAll()).decode("utf8")
+    fd.close()
+    (app or QApplication.instance()).setStyleSheet(text)
+    return text
+'''
+
+
+class ResourceError(Exception):
+    """Raised when a theme cannot be compiled into a resource."""
+
+
+def find_rcc():
+    """Return the path of the Qt resource compiler, or None."""
+    bundled = Path(PySide6.__file__).parent / "Qt" / "libexec" / "rcc"
+    for candidate in (bundled, bundled.with_suffix(".exe")):
+        if candidate.exists():
+            return str(candidate)
+    return shutil.which("rcc")
+
+
+def collect_assets(stylesheet, root, base=None):
+    """
+    Point the urls of a style sheet at images inside the resource.
+
+    Parameters
+    ----------
+    stylesheet : str
+        the style sheet contents.
+    root : str
+        the resource path the images are placed under.
+    base : str or os.PathLike, optional
+        directory relative urls are resolved against.
+
+    Returns
+    -------
+    tuple
+        the rewritten style sheet and a dictionary mapping resource
+        aliases to the image files on disk.  Urls that are already
+        resource paths or do not name an existing file are left alone.
+    """
+    assets, aliases = {}, {}
+
+    def replace(match):
+        url = match.group(2)
+        if url.startswith((":", "qrc:")):
+            return match.group(0)
+        path = Path(base or ".", url).resolve()
+        if not path.is_file():
+            return match.group(0)
+        alias = aliases.get(path)
+        if alias is None:
+            alias = f"images/{len(aliases)}-{path.name}"
+            aliases[path] = alias
+            assets[alias] = path
+        return f"url({root}/{alias})"
+
+    return _URL.sub(replace, stylesheet), assets
+
+
+def export_resource(theme, path, name=None, base=None):
+    """
+    Compile a theme and its images into a binary resource file.
+
+    The theme is optimized and minified, and stored with the images it
+    references in a zlib compressed ``.rcc`` file.  A python loader
+    module named after the resource is written next to it.
+
+    Parameters
+    ----------
+    theme : dict or str
+        selectors mapped to dictionaries of properties, or qss text.
+    path : str or os.PathLike
+        the resource file to create.
+    name : str, optional
+        the theme name used in the resource paths, by default the file
+        name of `path`.
+    base : str or os.PathLike, optional
+        directory relative image urls are resolved against.
+
+    Returns
+    -------
+    tuple
+        the paths of the resource file and the loader module.
+    """
+    rcc = find_rcc()
+    if rcc is None:
+        raise ResourceError("the Qt resource compiler rcc was not found")
+    path = Path(path).resolve()
+    path.parent.mkdir(parents=True, exist_ok=True)
+    name = name or path.stem
+    root = f":{PREFIX}/{name}"
+    if isinstance(theme, str):
+        theme = optimize_stylesheet(theme)
+    else:
+        theme = optimize(theme)
+    stylesheet = json_to_stylesheet(theme, minified=True)
+    stylesheet, assets = collect_assets(stylesheet, root, base)
+    with tempfile.TemporaryDirectory() as temp:
+        qss = Path(temp) / STYLESHEET
+        qss.write_text(stylesheet, encoding="utf8")
+        files = [(STYLESHEET, qss)] + sorted(assets.items())
+        entries = "".join(
+            f"    <file alias={quoteattr(alias)}>{escape(str(file))}</file>\n"
+            for alias, file in files
+        )
+        qrc = Path(temp) / "theme.qrc"
+        qrc.write_text(
+            f'<RCC>\n  <qresource prefix={quoteattr(PREFIX + "/" + name)}>'
+            f"\n{entries}  </qresource>\n</RCC>\n",
+            encoding="utf8",
+        )
+        command = [
+            rcc, "--binary", "--compress-algo", "zlib", "--threshold", "0",
+            "-o", str(path), str(qrc),
+        ]
+        result = subprocess.run(command, capture_output=True, text=True)
+    if result.returncode:
+        raise ResourceError(result.stderr.strip() or "rcc failed")
+    module = re.sub(r"\W", "_", path.stem)
+    loader = path.with_name(module + ".py")
+    loader.write_text(
+        LOADER.format(
+            name=name,
+            resource=path.name,
+            stylesheet=f"{root}/{STYLESHEET}",
+        ),
+        encoding="utf8",
+    )
+    return path, loader
+
+
+def main(args=None):
+    """Command line entry point for exporting theme resources."""
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("theme", help="theme json file")
+    parser.add_argument("resource", help="rcc file to create")
+    options = parser.parse_args(args)
+    with open(options.theme, "rt", encoding="utf8") as fd:
+        theme = json.load(fd)
+    base = os.path.dirname(os.path.abspath(options.theme))
+    name = Path(options.theme).stem
+    resource, loader = export_resource(theme, options.resource, name, base)
+    print(f"exported {resource} and {loader}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
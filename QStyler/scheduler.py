@@ -0,0 +1,110 @@
+#! /usr/bin/python3
+# -*- coding: utf-8 -*-
+
+##############################################################################
+#  Copyright 2022 alexpdev
+#
+#  Licensed under the Apache License, Version 2.0 (the "License");
+#  you may not use this file except in compliance with the License.
+#  You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+#  Unless required by applicable law or agreed to in writing, software
+#  distributed under the License is distributed on an "AS IS" BASIS,
+#  WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#  See the License for the specific language governing permissions and
+#  limitations under the License.
+##############################################################################
+"""Debounced scheduler for applying live style sheet updates."""
+
+import time
+
+from PySide6.QtCore import QObject, QTimer, Signal
+
+MIN_DELAY = 0
+MAX_DELAY = 500
+FACTOR = 2.0
+
+
+class LiveUpdateScheduler(QObject):
+    """
+    Coalesce bursts of update requests into a single call.
+
+    Every request restarts a single shot timer, so only the final state
+    of a burst is applied.  The length of the timer adapts to the cost of
+    the previous call: cheap updates run almost immediately while heavy
+    ones wait for a pause in the edits.  A burst that lasts longer than
+    the longest delay is applied anyway so the display never falls too
+    far behind.
+
+    Parameters
+    ----------
+    callback : callable
+        called without arguments to apply the update.
+    parent : QObject, optional
+        parent object, by default None
+    minimum : int
+        shortest delay in milliseconds.
+    maximum : int
+        longest delay in milliseconds.
+    factor : float
+        multiple of the last measured cost used as the delay.
+    """
+
+    applied = Signal(float)
+
+    def __init__(
+        self,
+        callback,
+        parent=None,
+        minimum=MIN_DELAY,
+        maximum=MAX_DELAY,
+        factor=FACTOR,
+    ):
+        """Construct the scheduler."""
+        super().__init__(parent)
+        self.callback = callback
+        self.minimum = minimum
+        self.maximum = maximum
+        self.factor = factor
+        self.cost = 0.0
+        self.pending = False
+        self.burst = None
+        self.timer = QTimer(self)
+        self.timer.setSingleShot(True)
+        self.timer.timeout.connect(self.flush)
+
+    def delay(self):
+        """Return the debounce window in milliseconds."""
+        delay = int(self.cost * 1000 * self.factor)
+        return max(self.minimum, min(self.maximum, delay))
+
+    def schedule(self):
+        """Request an update, postponing any update already waiting."""
+        now = time.perf_counter()
+        if not self.pending:
+            self.pending = True
+            self.burst = now
+        elapsed = int((now - self.burst) * 1000)
+        if self.timer.isActive() and elapsed >= self.maximum:
+            return
+        self.timer.start(self.delay())
+
+    def flush(self):
+        """Run the waiting update now, if there is one."""
+        self.timer.stop()
+        if not self.pending:
+            return
+        self.pending = False
+        self.burst = None
+        begin = time.perf_counter()
+        self.callback()
+        self.cost = time.perf_counter() - begin
+        self.applied.emit(self.cost)
+
+    def cancel(self):
+        """Drop the waiting update without running it."""
+        self.timer.stop()
+        self.pending = False
+        self.burst = None
@@ -0,0 +1,147 @@
+#! /usr/bin/python3
+# -*- coding: utf-8 -*-
+
+##############################################################################
+#  Copyright 2022 alexpdev
+#
+#  Licensed under the Apache License, Version 2.0 (the "License");
+#  you may not use this file except in compliance with the License.
+#  You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+#  Unless required by applicable law or agreed to in writing, software
+#  distributed under the License is distributed on an "AS IS" BASIS,
+#  WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#  See the License for the specific language governing permissions and
+#  limitations under the License.
+##############################################################################
+"""Apply style sheets to preview widgets instead of the application."""
+
+import re
+
+from PySide6.QtWidgets import QWidget
+
+from QStyler.profiler import profiler
+
+_COMBINATORS = re.compile(r"[\s>+~]+")
+_SUBJECT = re.compile(r"[.*]?([A-Za-z_]\w*)?(?:#([\w-]+))?")
+
+
+def selector_subject(selector):
+    """
+    Return the class and object name a selector applies to.
+
+    Only the last compound selector is considered, so the result matches
+    every widget the rule can style and possibly more.
+
+    Parameters
+    ----------
+    selector : str
+        a single selector, such as ``QFrame QPushButton#ok:hover``.
+
+    Returns
+    -------
+    tuple
+        the class name and the object name, either may be None when the
+        selector does not restrict it.
+    """
+    compound = _COMBINATORS.split(selector.strip())[-1]
+    match = _SUBJECT.match(compound)
+    return match.group(1), match.group(2)
+
+
+class PreviewScope:
+    """
+    Style a set of preview panes without touching the rest of the app.
+
+    Qt restyles the whole subtree of a widget whenever its style sheet is
+    set, so after an edit only the panes containing a widget that one of
+    the edited rules can match are given the new sheet.  The others keep
+    an older sheet that differs only in rules that match none of their
+    widgets.
+
+    Parameters
+    ----------
+    panes : list
+        the container widgets that receive the style sheet.
+    """
+
+    def __init__(self, panes=()):
+        """Construct the scope."""
+        self.panes = list(panes)
+        self.text = ""
+
+    def affected(self, selectors):
+        """
+        Return the panes holding a widget matched by any of `selectors`.
+
+        Parameters
+        ----------
+        selectors : tuple
+            the selectors of the edited rules.
+
+        Returns
+        -------
+        list
+            the panes that need the new style sheet.
+        """
+        subjects = {selector_subject(selector) for selector in selectors}
+        if (None, None) in subjects:
+            return list(self.panes)
+        panes = []
+        for pane in self.panes:
+            widgets = [pane] + pane.findChildren(QWidget)
+            for widget in widgets:
+                if any(
+                    self._matches(widget, name, ident)
+                    for name, ident in subjects
+                ):
+                    panes.append(pane)
+                    break
+        return panes
+
+    @staticmethod
+    def _matches(widget, name, ident):
+        """Return True if `widget` has class `name` and object `ident`."""
+        if ident is not None and widget.objectName() != ident:
+            return False
+        return name is None or widget.inherits(name)
+
+    @profiler.timed("apply.scoped")
+    def apply(self, text, diff=None):
+        """
+        Give the panes the style sheet `text`.
+
+        Parameters
+        ----------
+        text : str
+            the style sheet contents.
+        diff : RuleDiff, optional
+            the rules changed since the last call, every pane is restyled
+            when omitted.
+
+        Returns
+        -------
+        list
+            the panes that were restyled.
+        """
+        if diff is None or diff.reordered:
+            panes = list(self.panes)
+        else:
+            panes = self.affected(diff.selectors)
+        for pane in panes:
+            pane.setStyleSheet(text)
+        self.text = text
+        return panes
+
+    def refresh(self, pane):
+        """Give a pane whose widgets were just built the current sheet."""
+        if self.text:
+            pane.setStyleSheet(self.text)
+
+    def clear(self):
+        """Remove the style sheet from every pane."""
+        for pane in self.panes:
+            pane.setStyleSheet("")
+        self.text = ""
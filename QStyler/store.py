@@ -0,0 +1,347 @@
+#! /usr/bin/python3
+# -*- coding: utf-8 -*-
+
+##############################################################################
+#  Copyright 2022 alexpdev
+#
+#  Licensed under the Apache License, Version 2.0 (the "License");
+#  you may not use this file except in compliance with the License.
+#  You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+#  Unless required by applicable law or agreed to in writing, software
+#  distributed under the License is distributed on an "AS IS" BASIS,
+#  WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#  See the License for the specific language governing permissions and
+#  limitations under the License.
+##############################################################################
+"""
+Searchable SQLite store for large theme libraries.
+
+Import a directory with ``python -m QStyler.store DATABASE import DIR`` and
+query it with ``python -m QStyler.store DATABASE search "#bd93f9"`` or
+``python -m QStyler.store DATABASE selector "QTabBar::tab:selected"``.
+"""
+
+import argparse
+import json
+import sqlite3
+import sys
+from pathlib import Path
+
+from QStyler.cache import content_hash
+from QStyler.persistence import write_atomic
+from QStyler.utils import QssParser
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS themes (
+    id INTEGER PRIMARY KEY,
+    name TEXT NOT NULL UNIQUE,
+    digest TEXT
+);
+CREATE TABLE IF NOT EXISTS rules (
+    id INTEGER PRIMARY KEY,
+    theme_id INTEGER NOT NULL REFERENCES themes(id) ON DELETE CASCADE,
+    position INTEGER NOT NULL,
+    selector TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS declarations (
+    rule_id INTEGER NOT NULL REFERENCES rules(id) ON DELETE CASCADE,
+    position INTEGER NOT NULL,
+    property TEXT NOT NULL,
+    value TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS rules_theme ON rules(theme_id);
+CREATE INDEX IF NOT EXISTS rules_selector ON rules(selector);
+CREATE INDEX IF NOT EXISTS declarations_rule ON declarations(rule_id);
+CREATE INDEX IF NOT EXISTS declarations_property
+    ON declarations(property, value);
+"""
+FTS_SCHEMA = """
+CREATE VIRTUAL TABLE IF NOT EXISTS search USING fts5(
+    selector, body, tokenize = 'unicode61'
+);
+"""
+
+
+def has_fts(connection):
+    """Return True if the SQLite library was built with FTS5."""
+    try:
+        connection.execute("CREATE VIRTUAL TABLE temp.probe USING fts5(x)")
+    except sqlite3.OperationalError:
+        return False
+    connection.execute("DROP TABLE temp.probe")
+    return True
+
+
+class ThemeStore:
+    """
+    Themes stored as rules and declarations in an SQLite database.
+
+    Selectors and properties are indexed for exact lookups.  When the
+    SQLite library supports FTS5, every rule is also added to a full text
+    index so `search` can find words and colors anywhere in a theme;
+    otherwise `search` falls back to a slower substring scan.
+
+    Parameters
+    ----------
+    path : str or os.PathLike
+        the database file, by default an in memory database.
+    """
+
+    def __init__(self, path=":memory:"):
+        """Open the database and create the tables if needed."""
+        self.connection = sqlite3.connect(str(path))
+        self.connection.execute("PRAGMA foreign_keys = ON")
+        self.connection.executescript(SCHEMA)
+        self.fts = has_fts(self.connection)
+        if self.fts:
+            self.connection.executescript(FTS_SCHEMA)
+
+    def close(self):
+        """Close the database."""
+        self.connection.close()
+
+    def __enter__(self):
+        """Return the store for use in a with statement."""
+        return self
+
+    def __exit__(self, *_):
+        """Close the store at the end of a with statement."""
+        self.close()
+
+    def add_theme(self, name, theme, digest=None):
+        """
+        Store a theme, replacing any theme with the same name.
+
+        Parameters
+        ----------
+        name : str
+            the theme name.
+        theme : dict
+            selectors mapped to dictionaries of properties.
+        digest : str, optional
+            content hash of the source file, used to skip re-imports.
+        """
+        with self.connection:
+            self._remove(name)
+            cursor = self.connection.execute(
+                "INSERT INTO themes (name, digest) VALUES (?, ?)",
+                (name, digest),
+            )
+            theme_id = cursor.lastrowid
+            for position, (selector, props) in enumerate(theme.items()):
+                cursor = self.connection.execute(
+                    "INSERT INTO rules (theme_id, position, selector) "
+                    "VALUES (?, ?, ?)",
+                    (theme_id, position, selector),
+                )
+                rule_id = cursor.lastrowid
+                self.connection.executemany(
+                    "INSERT INTO declarations VALUES (?, ?, ?, ?)",
+                    [
+                        (rule_id, i, prop, value)
+                        for i, (prop, value) in enumerate(props.items())
+                    ],
+                )
+                if self.fts:
+                    body = " ".join(f"{k}: {v};" for k, v in props.items())
+                    self.connection.execute(
+                        "INSERT INTO search (rowid, selector, body) "
+                        "VALUES (?, ?, ?)",
+                        (rule_id, selector, body),
+                    )
+
+    def add_qss(self, name, text):
+        """Parse a qss style sheet and store the result as theme `name`."""
+        self.add_theme(name, QssParser(text).results, content_hash(text).hex())
+
+    def remove_theme(self, name):
+        """Delete a theme and its rules."""
+        with self.connection:
+            self._remove(name)
+
+    def _remove(self, name):
+        """Delete a theme inside the current transaction."""
+        if self.fts:
+            self.connection.execute(
+                "DELETE FROM search WHERE rowid IN (SELECT rules.id FROM "
+                "rules JOIN themes ON themes.id = rules.theme_id "
+                "WHERE themes.name = ?)",
+                (name,),
+            )
+        self.connection.execute("DELETE FROM themes WHERE name = ?", (name,))
+
+    def names(self):
+        """Return the names of the stored themes in alphabetical order."""
+        rows = self.connection.execute("SELECT name FROM themes ORDER BY name")
+        return [name for name, in rows]
+
+    def digest(self, name):
+        """Return the content hash recorded for a theme, or None."""
+        row = self.connection.execute(
+            "SELECT digest FROM themes WHERE name = ?", (name,)
+        ).fetchone()
+        return row[0] if row else None
+
+    def theme(self, name):
+        """
+        Rebuild a stored theme.
+
+        Parameters
+        ----------
+        name : str
+            the theme name.
+
+        Returns
+        -------
+        dict
+            selectors mapped to dictionaries of properties, in the order
+            they were stored.
+        """
+        rows = self.connection.execute(
+            "SELECT rules.selector, declarations.property, declarations.value "
+            "FROM themes JOIN rules ON rules.theme_id = themes.id "
+            "LEFT JOIN declarations ON declarations.rule_id = rules.id "
+            "WHERE themes.name = ? "
+            "ORDER BY rules.position, declarations.position",
+            (name,),
+        )
+        theme = {}
+        for selector, prop, value in rows:
+            props = theme.setdefault(selector, {})
+            if prop is not None:
+                props[prop] = value
+        return theme
+
+    def themes_with_selector(self, selector):
+        """Return the themes that have a rule for `selector`."""
+        rows = self.connection.execute(
+            "SELECT DISTINCT themes.name FROM rules "
+            "JOIN themes ON themes.id = rules.theme_id "
+            "WHERE rules.selector = ? ORDER BY themes.name",
+            (selector,),
+        )
+        return [name for name, in rows]
+
+    def themes_with_property(self, prop, value=None):
+        """Return the themes that set `prop`, optionally to `value`."""
+        query = (
+            "SELECT DISTINCT themes.name FROM declarations "
+            "JOIN rules ON rules.id = declarations.rule_id "
+            "JOIN themes ON themes.id = rules.theme_id "
+            "WHERE declarations.property = ?"
+        )
+        args = (prop,)
+        if value is not None:
+            query += " AND declarations.value = ?"
+            args += (value,)
+        rows = self.connection.execute(query + " ORDER BY themes.name", args)
+        return [name for name, in rows]
+
+    def search(self, text):
+        """
+        Find the themes mentioning `text` in a selector or declaration.
+
+        Parameters
+        ----------
+        text : str
+            words, a selector or a value such as ``#bd93f9``, matched as a
+            phrase and regardless of case.
+
+        Returns
+        -------
+        list
+            the matching theme names in alphabetical order.
+        """
+        if self.fts:
+            phrase = '"' + text.replace('"', '""') + '"'
+            rows = self.connection.execute(
+                "SELECT DISTINCT themes.name FROM search "
+                "JOIN rules ON rules.id = search.rowid "
+                "JOIN themes ON themes.id = rules.theme_id "
+                "WHERE search MATCH ? ORDER BY themes.name",
+                (phrase,),
+            )
+        else:
+            pattern = f"%{text}%"
+            rows = self.connection.execute(
+                "SELECT DISTINCT themes.name FROM rules "
+                "JOIN themes ON themes.id = rules.theme_id "
+                "LEFT JOIN declarations ON declarations.rule_id = rules.id "
+                "WHERE rules.selector LIKE ?1 OR declarations.value LIKE ?1 "
+                "OR declarations.property LIKE ?1 ORDER BY themes.name",
+                (pattern,),
+            )
+        return [name for name, in rows]
+
+    def import_directory(self, directory):
+        """
+        Store every json theme in a directory, skipping unchanged ones.
+
+        Parameters
+        ----------
+        directory : str or os.PathLike
+            the themes directory.
+
+        Returns
+        -------
+        int
+            the number of themes added or updated.
+        """
+        count = 0
+        for path in sorted(Path(directory).glob("*.json")):
+            text = path.read_text(encoding="utf8")
+            digest = content_hash(text).hex()
+            if self.digest(path.stem) == digest:
+                continue
+            self.add_theme(path.stem, json.loads(text), digest)
+            count += 1
+        return count
+
+    def export_directory(self, directory):
+        """
+        Write every stored theme to a json file in `directory`.
+
+        Returns
+        -------
+        int
+            the number of themes written.
+        """
+        directory = Path(directory)
+        directory.mkdir(parents=True, exist_ok=True)
+        names = self.names()
+        for name in names:
+            write_atomic(directory / (name + ".json"), self.theme(name))
+        return len(names)
+
+
+def main(args=None):
+    """Command line entry point for the theme store."""
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("database")
+    parser.add_argument(
+        "command",
+        choices=["import", "export", "search", "selector", "property"],
+    )
+    parser.add_argument("argument", help="a directory or a search term")
+    options = parser.parse_args(args)
+    with ThemeStore(options.database) as store:
+        if options.command == "import":
+            print(f"imported {store.import_directory(options.argument)}")
+        elif options.command == "export":
+            print(f"exported {store.export_directory(options.argument)}")
+        else:
+            query = {
+                "search": store.search,
+                "selector": store.themes_with_selector,
+                "property": store.themes_with_property,
+            }[options.command]
+            for name in query(options.argument):
+                print(name)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -23,18 +23,34 @@ import os
 import re
 from pathlib import Path
 
-from PySide6.QtCore import Qt, Signal
-from PySide6.QtGui import QAction, QFontMetricsF
+from PySide6.QtCore import QSize, Qt, QTimer, Signal
+from PySide6.QtGui import QAction, QFontMetricsF, QIcon, QTextCursor
 from PySide6.QtWidgets import (QApplication, QComboBox, QFileDialog,
                                QHBoxLayout, QLabel, QListWidget,
-                               QListWidgetItem, QSlider, QTextEdit, QToolBar,
-                               QVBoxLayout, QWidget)
+                               QListWidgetItem, QSlider, QStyledItemDelegate,
+                               QTextEdit, QToolBar, QVBoxLayout, QWidget)
 
+from QStyler.bundle import open_bundle
+from QStyler.catalog import ThemeCatalog
 from QStyler.dialog import NewDialog, RenameDialog
-from QStyler.utils import (ParsingError, QssParser, apply_stylesheet, get_icon,
-                           json_to_stylesheet, open_github_browser)
+from QStyler.diff import diff_rules
+from QStyler.incremental import IncrementalParser
+from QStyler.optimizer import optimize_stylesheet
+from QStyler.persistence import ThemeWriter
+from QStyler.profiler import profiler
+from QStyler.resources import ResourceError, export_resource
+from QStyler.scheduler import LiveUpdateScheduler
+from QStyler.scope import PreviewScope
+from QStyler.themecache import ThemeCache
+from QStyler.thumbnails import ThumbnailRenderer
+from QStyler.utils import (QssParser, apply_stylesheet, get_icon,
+                           json_to_stylesheet, open_github_browser,
+                           parse_stylesheet, recover_stylesheet)
+from QStyler.watcher import ThemeWatcher
+from QStyler.worker import ParseWorker
 
 THEMES = Path(__file__).parent / "themes"
+PREFETCH = 2
 
 
 class ColorPicker(QWidget):
@@ -106,6 +122,53 @@ class Editor(QTextEdit):
     """Text editor widget."""
 
 
+class ThumbnailDelegate(QStyledItemDelegate):
+    """Item delegate keeping every row as tall as a thumbnail."""
+
+    def sizeHint(self, option, index):
+        """Return the size of a row, with or without its thumbnail."""
+        size = super().sizeHint(option, index)
+        return size.expandedTo(QSize(0, option.decorationSize.height() + 2))
+
+
+class ThemeCombo(QComboBox):
+    """Combo box listing the themes, with thumbnails in its popup."""
+
+    rowsShown = Signal(int, int)
+
+    def __init__(self, parent=None):
+        """Construct the combo box and follow the scrolling of its popup."""
+        super().__init__(parent)
+        self.setItemDelegate(ThumbnailDelegate(self))
+        self.view().verticalScrollBar().valueChanged.connect(
+            self.show_rows
+        )
+
+    def set_thumbnail_size(self, size):
+        """Show thumbnails of `size` in the popup and small ones closed."""
+        self.setIconSize(size.scaled(QSize(64, 16), Qt.KeepAspectRatio))
+        view = self.view()
+        view.setIconSize(size)
+        view.setMinimumWidth(size.width() * 2)
+
+    def showPopup(self):
+        """Show the popup and announce the rows it shows."""
+        super().showPopup()
+        self.show_rows()
+
+    def show_rows(self):
+        """Emit `rowsShown` with the first and last row in the popup."""
+        view = self.view()
+        if not view.isVisible():
+            return
+        rect = view.viewport().rect()
+        first = view.indexAt(rect.topLeft()).row()
+        last = view.indexAt(rect.bottomLeft()).row()
+        if last < 0:
+            last = self.count() - 1
+        self.rowsShown.emit(max(first, 0), last)
+
+
 class ControlsList(QListWidget):
     """List widget for controls."""
 
@@ -191,6 +254,10 @@ class ToolBar(QToolBar):
         self.preview_action = QAction(get_icon("preview"), "preview", self)
         self.load_action = QAction(get_icon("confirm"), "load", self)
         self.reset_action = QAction(get_icon("reset"), "reset", self)
+        self.scope_action = QAction(get_icon("checked"), "scoped", self)
+        self.scope_action.setCheckable(True)
+        self.scope_action.setChecked(False)
+        self.optimize_action = QAction(get_icon("minus"), "optimize", self)
         self.load_action.setDisabled(True)
         self.live_action.setCheckable(True)
         self.live_action.setChecked(True)
@@ -203,18 +270,43 @@ class ToolBar(QToolBar):
                 self.load_action,
                 self.preview_action,
                 self.reset_action,
+                self.scope_action,
+                self.optimize_action,
             ]
         )
         self.addSeparator()
-        self.themes_combo = QComboBox()
+        self.themes_combo = ThemeCombo()
         font = self.themes_combo.font()
         font.setPointSize(10)
         self.themes_combo.setFont(font)
         self.themes_combo.addItem("", "")
-        for file in os.listdir(self.themes_dir):
-            theme_name = os.path.splitext(file)[0]
+        self.bundle = open_bundle()
+        self.catalog = ThemeCatalog(
+            self.themes_dir, scan=self.bundle is None
+        )
+        self.writer = ThemeWriter(self)
+        self.writer.saved.connect(self.on_theme_saved)
+        self.writer.failed.connect(self.on_save_failed)
+        QApplication.instance().aboutToQuit.connect(self.writer.flush)
+        self.watcher = None
+        if os.path.isdir(self.themes_dir):
+            self.watcher = ThemeWatcher(self.catalog, self)
+            self.watcher.themesChanged.connect(self.on_themes_changed)
+        if self.bundle is not None:
+            QTimer.singleShot(0, self.sync_themes)
+        names = self.catalog.names()
+        if self.bundle is not None:
+            names += [n for n in self.bundle.names() if n not in names]
+        for theme_name in names:
             self.themes_combo.addItem(theme_name, theme_name)
         self.addWidget(self.themes_combo)
+        self.thumbnails = ThumbnailRenderer(
+            self.catalog, self.bundle, parent=self
+        )
+        self.thumbnails.rendered.connect(self.set_thumbnail)
+        self.themes_combo.set_thumbnail_size(self.thumbnails.size)
+        self.themes_combo.rowsShown.connect(self.request_thumbnails)
+        QApplication.instance().aboutToQuit.connect(self.thumbnails.shutdown)
         self.new_action = QAction(get_icon("add"), "new", self)
         self.save_action = QAction(get_icon("save"), "save", self)
         self.rename_action = QAction(get_icon("rename"), "rename", self)
@@ -244,6 +336,8 @@ class ToolBar(QToolBar):
         self.delete_action.triggered.connect(self.delete_theme)
         self.import_action.triggered.connect(self.import_theme)
         self.extend_action.triggered.connect(self.on_extended)
+        self.themes_combo.currentTextChanged.connect(self.update_actions)
+        self.update_actions()
 
     def on_extended(self):
         """Triggers extending the screen to view widgets while styling them."""
@@ -256,10 +350,40 @@ class ToolBar(QToolBar):
             self.extended_state = False
             self.extend.emit(False)
 
+    def is_editable(self, name):
+        """Return True if theme `name` is a file and not a bundled theme."""
+        if self.bundle is not None and name in self.bundle:
+            return False
+        return self.catalog.get(name) is not None
+
+    def update_actions(self):
+        """Only allow deleting and renaming themes that can be changed."""
+        editable = self.is_editable(self.themes_combo.currentText())
+        self.delete_action.setEnabled(editable)
+        self.rename_action.setEnabled(editable)
+
+    def sync_themes(self):
+        """Index the themes directory once startup has finished."""
+        before = set(self.catalog.entries)
+        self.catalog.refresh()
+        after = set(self.catalog.entries)
+        self.on_themes_changed(sorted(after - before), sorted(before - after))
+
     def delete_theme(self):
         """Delete the current theme in combo box."""
         theme = self.themes_combo.currentText()
-        os.remove(self.themes_dir / (theme + ".json"))
+        self.writer.flush()
+        if not self.is_editable(theme):
+            return
+        path = self.catalog.get(theme).path
+        try:
+            os.remove(path)
+        except OSError as err:
+            self.window().statusBar().showMessage(
+                f"Error deleting {path}: {err}", 4000
+            )
+            return
+        self.catalog.remove(theme)
         index = self.themes_combo.currentIndex()
         self.themes_combo.removeItem(index)
 
@@ -274,13 +398,21 @@ class ToolBar(QToolBar):
 
     def set_theme_name(self, new, old):
         """Set the new name for current theme."""
-        for i in range(self.themes_combo.count()):
-            if self.themes_combo.itemText(i) == old:
-                self.themes_combo.setItemText(i, new)
-                old_path = os.path.join(self.themes_dir, old + ".json")
-                new_path = os.path.join(self.themes_dir, new + ".json")
-                os.rename(old_path, new_path)
-                break
+        self.writer.flush()
+        index = self.themes_combo.findText(old)
+        if index < 0 or not self.is_editable(old):
+            return
+        old_path = self.catalog.get(old).path
+        new_path = os.path.join(os.path.dirname(old_path), new + ".json")
+        try:
+            os.rename(old_path, new_path)
+        except OSError as err:
+            self.window().statusBar().showMessage(
+                f"Error renaming {old_path}: {err}", 4000
+            )
+            return
+        self.catalog.rename(old, new)
+        self.themes_combo.setItemText(index, new)
 
     def rename_theme(self):
         """Rename the current theme."""
@@ -292,8 +424,43 @@ class ToolBar(QToolBar):
     def set_new_name(self, name):
         """Set new theme and give it a name."""
         self.themes_combo.addItem(name)
-        json.dump(
-            {}, open(self.themes_dir / (name + ".json"), "wt", encoding="utf8")
+        self.writer.save(name, self.themes_dir / (name + ".json"), {})
+
+    def on_themes_changed(self, added, removed, _=None):
+        """Add and remove the combo entries of themes changed on disk."""
+        current = self.themes_combo.currentText()
+        for name in added:
+            if self.themes_combo.findText(name) < 0:
+                self.themes_combo.addItem(name, name)
+        for name in removed:
+            bundled = self.bundle is not None and name in self.bundle
+            index = self.themes_combo.findText(name)
+            if index > 0 and name != current and not bundled:
+                self.themes_combo.removeItem(index)
+        self.update_actions()
+
+    def request_thumbnails(self, first, last):
+        """Show the cached thumbnails of some rows and render the others."""
+        combo = self.themes_combo
+        names = [combo.itemText(i) for i in range(first, last + 1)]
+        self.thumbnails.request([name for name in names if name])
+
+    def set_thumbnail(self, name, path):
+        """Show a rendered thumbnail next to its theme name."""
+        index = self.themes_combo.findText(name)
+        if index > 0:
+            self.themes_combo.setItemIcon(index, QIcon(path))
+
+    def on_theme_saved(self, name, path):
+        """Index a theme file once it has been written."""
+        if name:
+            self.catalog.update(name, path)
+            self.update_actions()
+
+    def on_save_failed(self, path, error):
+        """Report a theme file that could not be written."""
+        self.window().statusBar().showMessage(
+            f"Error saving to {path}: {error}", 4000
         )
 
     def new_dialog(self):
@@ -312,19 +479,17 @@ class ToolBar(QToolBar):
             name = os.path.split(path)[1]
             root = os.path.splitext(name)[0]
             self.themes_combo.addItem(root)
-            parser = QssParser(open(path, encoding="utf8").read())
+            parser = QssParser()
+            parser.parse_file(path)
             file_path = self.themes_dir / (root + ".json")
-            json.dump(
-                parser.results,
-                open(file_path, "wt", encoding="utf8"),
-                indent=4,
-            )
+            self.writer.save(root, file_path, parser.results)
 
 
 class StylerTab(QWidget):
     """Styler Widget."""
 
     extend = Signal(bool)
+    rulesChanged = Signal(object)
 
     def __init__(self, parent=None):
         """Construct styler widget."""
@@ -376,11 +541,28 @@ class StylerTab(QWidget):
             QFontMetricsF(self.editor.font()).horizontalAdvance(" ") * 4
         )
         self.editor.setUndoRedoEnabled(True)
+        self.sheet = IncrementalParser()
+        self.scheduler = LiveUpdateScheduler(self.parse_changes, self)
+        self.worker = ParseWorker(self)
+        self.worker.finished.connect(self.on_parsed)
+        self.deferred = False
+        self.applied = ({}, (), None)
+        self.scope = PreviewScope()
+        self.themes = ThemeCache(
+            self.toolbar.catalog, bundle=self.toolbar.bundle
+        )
+        self.digest = None
+        if self.toolbar.watcher is not None:
+            self.toolbar.watcher.themesChanged.connect(self.on_themes_changed)
+        self.toolbar.writer.saved.connect(self.on_theme_saved)
+        self.editor.document().contentsChange.connect(self.on_contents_change)
         self.editor.textChanged.connect(self.live_update)
         self.colorPicker.colorChanged.connect(self.insert_color)
         self.toolbar.load_action.triggered.connect(self.parse_changes)
         self.toolbar.preview_action.toggled.connect(self.preview_style)
         self.toolbar.reset_action.triggered.connect(self.reset_editor)
+        self.toolbar.scope_action.toggled.connect(self.set_scoped)
+        self.toolbar.optimize_action.triggered.connect(self.optimize_sheet)
         self.current_style = None
         self.widget_list.itemClicked.connect(self.on_widget_clicked)
         self.widget_list.itemDoubleClicked.connect(
@@ -394,15 +576,12 @@ class StylerTab(QWidget):
 
     def save_sheet(self):
         """Save the current content of the editor to theme doc."""
-        content = self.editor.toPlainText()
-        parser = QssParser(content)
-        results = parser.results
-        name = self.toolbar.themes_combo.currentText()
-        json.dump(
-            results,
-            open(str(THEMES / name) + ".json", "wt", encoding="utf8"),
-            indent=4,
-        )
+        with profiler.span("theme.save"):
+            content = self.editor.toPlainText()
+            results = parse_stylesheet(content).results
+            name = self.toolbar.themes_combo.currentText()
+            path = str(THEMES / name) + ".json"
+            self.toolbar.writer.save(name, path, results)
 
     def on_widget_clicked(self, item):
         """Trigger action when button is clicked."""
@@ -459,15 +638,62 @@ class StylerTab(QWidget):
         self.editor.clear()
         self.parse_changes()
 
+    def optimize_sheet(self):
+        """Replace the editor contents with the optimized style sheet."""
+        text = self.editor.toPlainText()
+        errors = parse_stylesheet(text, urls=True).errors
+        if errors:
+            self.window().statusBar().showMessage(
+                f"Not optimized, fix the error at {errors[0]} first", 4000
+            )
+            return
+        optimized = json_to_stylesheet(optimize_stylesheet(text))
+        cursor = self.editor.textCursor()
+        cursor.beginEditBlock()
+        cursor.select(QTextCursor.SelectionType.Document)
+        cursor.insertText(optimized)
+        cursor.endEditBlock()
+        self.window().statusBar().showMessage(
+            f"Optimized {len(text)} characters to {len(optimized)}", 4000
+        )
+
     def set_current_theme(self, title):
         """Set the current theme to editor contents."""
-        style = ""
-        for path in self.toolbar.themes_dir.iterdir():
-            if path.stem == title:
-                data = json.load(open(path, encoding="utf8"))
-                style = json_to_stylesheet(data)
-        self.editor.setPlainText(style)
-        self.live_update()
+        with profiler.span("theme.load"):
+            style = self.themes.stylesheet(title) if title else ""
+            entry = self.toolbar.catalog.entries.get(title)
+            self.digest = entry.digest if entry is not None else None
+            if self.toolbar.watcher is not None:
+                self.toolbar.watcher.watch_theme(title)
+            self.editor.setPlainText(style)
+            self.live_update()
+            self.scheduler.flush()
+        self.prefetch_themes()
+
+    def on_themes_changed(self, _, __, changed):
+        """Reload the current theme if its file now has other contents."""
+        title = self.toolbar.themes_combo.currentText()
+        entry = self.toolbar.catalog.entries.get(title)
+        if title in changed and entry.digest != self.digest:
+            self.set_current_theme(title)
+
+    def on_theme_saved(self, name, _):
+        """Remember the contents of the current theme after saving it."""
+        entry = self.toolbar.catalog.entries.get(name)
+        current = self.toolbar.themes_combo.currentText()
+        if entry is not None and name == current:
+            self.digest = entry.digest
+
+    def prefetch_themes(self):
+        """Render the themes next to the current one in the background."""
+        combo = self.toolbar.themes_combo
+        index = combo.currentIndex()
+        first = max(index - PREFETCH, 0)
+        last = min(index + PREFETCH + 1, combo.count())
+        names = [
+            combo.itemText(i) for i in range(first, last) if i != index
+        ]
+        self.themes.prefetch([name for name in names if name])
 
     def preview_style(self, checked):
         """Save current theme then preview contents of editor."""
@@ -503,19 +729,87 @@ class StylerTab(QWidget):
             cursor.deleteChar()
         self.editor.insertPlainText(color + ";")
 
+    def on_contents_change(self, position, removed, added):
+        """Re-parse the rule blocks touched by an edit in the editor."""
+        text = self.editor.toPlainText()
+        replaced = position == 0 and added >= len(text)
+        synced = len(text) == self.editor.document().characterCount() - 1
+        if self.worker.busy or replaced or not synced:
+            self.worker.submit(text)
+        else:
+            self.sheet.update(text, position, removed, added)
+
+    def on_parsed(self, text, index):
+        """Install the index of a document parsed in the background."""
+        self.sheet.reset(text, index)
+        if self.deferred:
+            self.deferred = False
+            self.parse_changes()
+
+    def set_scoped(self, scoped):
+        """Switch between styling the preview panes and the whole app."""
+        if scoped:
+            QApplication.instance().setStyleSheet("")
+        else:
+            self.scope.clear()
+        self.applied = ({}, (), None)
+        self.live_update()
+
     def live_update(self):
-        """Update theme in real time."""
+        """Schedule a real time update of the theme."""
         if self.toolbar.live_action.isChecked():
-            self.parse_changes()
+            self.scheduler.schedule()
 
     def parse_changes(self):
         """Parse changes in current editor contents."""
+        self.scheduler.cancel()
+        if self.worker.busy:
+            self.deferred = True
+            return
         text = self.editor.toPlainText()
+        results, app = self.sheet.results, QApplication.instance()
+        if not self.sheet.valid:
+            diagnostics = self.sheet.diagnostics(text)
+            message = f"Error at {diagnostics[0]}"
+            if len(diagnostics) > 1:
+                message += f" (+{len(diagnostics) - 1} more)"
+            self.window().statusBar().showMessage(message, 2000)
+        scoped = self.toolbar.scope_action.isChecked()
+        current = self.scope.text if scoped else app.styleSheet()
+        previous, order, style = self.applied
+        cascade, sequence = self.sheet.cascade, self.sheet.sequence()
+        diff = diff_rules(previous, cascade, (order, sequence))
+        if diff.empty and current == style:
+            return
+        if not self.sheet.valid:
+            text = recover_stylesheet(text)
+        if scoped:
+            self.scope.apply(text, None if current != style else diff)
+            current = self.scope.text
+        else:
+            apply_stylesheet(text, results)
+            current = app.styleSheet()
+        self.applied = (dict(cascade), sequence, current)
+        self.rulesChanged.emit(diff)
+
+    def export_resource(self):  # pragma: nocover
+        """Export the editor contents as a compiled Qt resource."""
+        path, _ = QFileDialog.getSaveFileName(
+            self, caption="Export Resource", filter="Qt Resource (*.rcc)"
+        )
+        if not path:
+            return
+        if not path.lower().endswith(".rcc"):
+            path += ".rcc"
+        text = self.editor.toPlainText()
+        name = self.toolbar.themes_combo.currentText() or None
         try:
-            apply_stylesheet(text)
-        except ParsingError as err:  # pragma: nocover
-            a = str(err)
-            self.window().statusBar().showMessage(f"Error near line {a}", 2000)
+            export_resource(text, path, name, self.toolbar.themes_dir)
+        except (OSError, ResourceError) as err:
+            message = f"Error exporting {path}: {err}"
+        else:
+            message = f"Resource saved to {path}"
+        self.window().statusBar().showMessage(message, 4000)
 
     def export_theme(self):  # pragma: nocover
         """Export current editor contents to qss file."""
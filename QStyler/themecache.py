@@ -0,0 +1,222 @@
+#! /usr/bin/python3
+# -*- coding: utf-8 -*-
+
+##############################################################################
+#  Copyright 2022 alexpdev
+#
+#  Licensed under the Apache License, Version 2.0 (the "License");
+#  you may not use this file except in compliance with the License.
+#  You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+#  Unless required by applicable law or agreed to in writing, software
+#  distributed under the License is distributed on an "AS IS" BASIS,
+#  WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#  See the License for the specific language governing permissions and
+#  limitations under the License.
+##############################################################################
+"""Cache of rendered style sheets for the themes in a catalog."""
+
+import json
+import os
+import threading
+from collections import OrderedDict
+
+from PySide6.QtCore import QThreadPool
+
+from QStyler.model import Stylesheet
+from QStyler.utils import json_to_stylesheet
+
+MAXSIZE = 16
+
+
+class RenderedTheme:
+    """A theme read from disk and its style sheet."""
+
+    __slots__ = ("key", "theme", "stylesheet", "model")
+
+    def __init__(self, key, theme, stylesheet):
+        """
+        Construct the rendered theme.
+
+        Parameters
+        ----------
+        key : tuple or None
+            size and modification time of the file when it was read, None
+            for themes read from a bundle.
+        theme : dict
+            the theme contents.
+        stylesheet : str
+            the theme converted to qss.
+        """
+        self.key = key
+        self.theme = theme
+        self.stylesheet = stylesheet
+        self.model = None
+
+
+class ThemeCache:
+    """
+    Least recently used cache of rendered themes.
+
+    Entries are validated against the size and modification time the
+    catalog reports for the theme, so a theme edited on disk is read
+    again while switching back to an unchanged theme costs no file reads
+    or serialization.  Themes missing from the catalog are looked up in
+    the optional bundle.  Themes can be rendered ahead of time on a
+    background thread with `prefetch`.  Cached values are shared and must
+    be treated as read only.
+
+    Parameters
+    ----------
+    catalog : ThemeCatalog
+        the catalog the themes are looked up in.
+    maxsize : int
+        maximum number of cached themes.
+    bundle : ThemeBundle, optional
+        packed themes used when the catalog has no such theme.
+    """
+
+    def __init__(self, catalog, maxsize=MAXSIZE, bundle=None):
+        """Construct an empty cache."""
+        self.catalog = catalog
+        self.bundle = bundle
+        self.maxsize = maxsize
+        self.hits = self.misses = 0
+        self.pool = QThreadPool()
+        self.pool.setMaxThreadCount(1)
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def _render(path):
+        """Read and render the theme file at `path`."""
+        with open(path, "rb") as fd:
+            stat = os.fstat(fd.fileno())
+            theme = json.loads(fd.read().decode("utf8"))
+        key = (stat.st_size, stat.st_mtime_ns)
+        return RenderedTheme(key, theme, json_to_stylesheet(theme))
+
+    def _unbundle(self, name):
+        """Decode and render a theme from the bundle."""
+        theme = self.bundle.load(name)
+        return RenderedTheme(None, theme, json_to_stylesheet(theme))
+
+    def _key(self, name):
+        """Return the key a valid entry for `name` has, False if none."""
+        entry = self.catalog.entries.get(name)
+        if entry is not None:
+            return (entry.size, entry.mtime)
+        if self.bundle is not None and name in self.bundle:
+            return None
+        return False
+
+    def _store(self, name, rendered):
+        """Insert an entry, evicting the least recently used ones."""
+        with self._lock:
+            self._entries[name] = rendered
+            self._entries.move_to_end(name)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+
+    def _cached(self, name, key):
+        """Return the cached rendering if it has the expected key."""
+        with self._lock:
+            rendered = self._entries.get(name)
+            if rendered is None or rendered.key != key:
+                return None
+            self._entries.move_to_end(name)
+            return rendered
+
+    def lookup(self, name):
+        """
+        Return the rendered theme, reading it from disk on a miss.
+
+        Parameters
+        ----------
+        name : str
+            the theme name.
+
+        Returns
+        -------
+        RenderedTheme or None
+            the rendered theme, or None if there is no such theme.
+        """
+        entry = self.catalog.get(name)
+        key = self._key(name)
+        if key is False:
+            self.discard(name)
+            return None
+        rendered = self._cached(name, key)
+        if rendered is not None:
+            self.hits += 1
+            return rendered
+        self.misses += 1
+        if entry is None:
+            rendered = self._unbundle(name)
+        else:
+            rendered = self._render(entry.path)
+        self._store(name, rendered)
+        return rendered
+
+    def stylesheet(self, name):
+        """Return the qss of a theme, empty if there is no such theme."""
+        rendered = self.lookup(name)
+        return rendered.stylesheet if rendered is not None else ""
+
+    def theme(self, name):
+        """Return the contents of a theme, empty if there is none."""
+        rendered = self.lookup(name)
+        return rendered.theme if rendered is not None else {}
+
+    def model(self, name):
+        """Return the parsed `Stylesheet` model of a theme."""
+        rendered = self.lookup(name)
+        if rendered is None:
+            return Stylesheet()
+        if rendered.model is None:
+            rendered.model = Stylesheet.from_dict(rendered.theme)
+        return rendered.model
+
+    def prefetch(self, names):
+        """
+        Render themes that are not cached yet on a background thread.
+
+        Parameters
+        ----------
+        names : list
+            the names of the themes likely to be viewed next.
+        """
+        for name in names:
+            key = self._key(name)
+            if key is False or self._cached(name, key) is not None:
+                continue
+            self.pool.start(lambda n=name: self._fetch(n))
+
+    def _fetch(self, name):
+        """Render a theme on a pool thread."""
+        entry = self.catalog.entries.get(name)
+        try:
+            if entry is None:
+                rendered = self._unbundle(name)
+            else:
+                rendered = self._render(entry.path)
+        except (OSError, ValueError, KeyError):
+            return
+        self._store(name, rendered)
+
+    def wait(self):
+        """Block until every prefetch has finished."""
+        self.pool.waitForDone()
+
+    def discard(self, name):
+        """Remove a theme from the cache."""
+        with self._lock:
+            self._entries.pop(name, None)
+
+    def clear(self):
+        """Remove every theme and reset the counters."""
+        with self._lock:
+            self._entries.clear()
+            self.hits = self.misses = 0
@@ -0,0 +1,241 @@
+#! /usr/bin/python3
+# -*- coding: utf-8 -*-
+
+##############################################################################
+#  Copyright 2022 alexpdev
+#
+#  Licensed under the Apache License, Version 2.0 (the "License");
+#  you may not use this file except in compliance with the License.
+#  You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+#  Unless required by applicable law or agreed to in writing, software
+#  distributed under the License is distributed on an "AS IS" BASIS,
+#  WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#  See the License for the specific language governing permissions and
+#  limitations under the License.
+##############################################################################
+"""Offscreen rendering of theme thumbnails in worker processes."""
+
+import concurrent.futures
+import hashlib
+import json
+import multiprocessing
+import os
+import tempfile
+from pathlib import Path
+
+from PySide6.QtCore import QCoreApplication, QObject, QSize, Qt, Signal
+
+from QStyler.bundle import ThemeBundle
+from QStyler.utils import get_cache_dir, json_to_stylesheet
+
+SIZE = QSize(160, 80)
+CANVAS = QSize(960, 480)
+WORKERS = 4
+
+_application = None
+
+
+def _start_process():
+    """Create the offscreen application of a worker process."""
+    global _application
+    os.environ["QT_QPA_PLATFORM"] = "offscreen"
+    from PySide6.QtWidgets import QApplication
+    _application = QApplication.instance() or QApplication([])
+
+
+def render_thumbnail(source, name, target, width, height):
+    """
+    Render the widgets gallery under a theme and save it as a png file.
+
+    Parameters
+    ----------
+    source : str
+        the theme json file, or the bundle holding theme `name`.
+    name : str
+        the theme name.
+    target : str
+        the png file to write.
+    width : int
+        width of the thumbnail.
+    height : int
+        height of the thumbnail.
+
+    Returns
+    -------
+    str
+        the `target` path.
+    """
+    from QStyler.widgets import WidgetsTab
+    if source.endswith(".json"):
+        with open(source, "rt", encoding="utf8") as fd:
+            theme = json.load(fd)
+    else:
+        with ThemeBundle(source) as bundle:
+            theme = bundle.load(name)
+    gallery = WidgetsTab()
+    gallery.setAttribute(Qt.WidgetAttribute.WA_DontShowOnScreen)
+    gallery.setStyleSheet(json_to_stylesheet(theme, minified=True))
+    gallery.resize(CANVAS)
+    gallery.show()
+    image = gallery.grab().scaled(
+        QSize(width, height),
+        Qt.AspectRatioMode.KeepAspectRatioByExpanding,
+        Qt.TransformationMode.SmoothTransformation,
+    ).copy(0, 0, width, height)
+    gallery.close()
+    gallery.deleteLater()
+    directory, base = os.path.split(target)
+    fd, temp = tempfile.mkstemp(dir=directory, prefix="." + base)
+    os.close(fd)
+    try:
+        if not image.save(temp, "PNG"):
+            raise OSError(f"could not write {target}")
+        os.replace(temp, target)
+    except BaseException:
+        os.remove(temp)
+        raise
+    return target
+
+
+def default_directory():
+    """Return the thumbnail cache directory of the current user."""
+    return get_cache_dir() / "thumbnails"
+
+
+class ThumbnailRenderer(QObject):
+    """
+    Cache of theme thumbnails rendered by a pool of offscreen processes.
+
+    Thumbnails are png files named after the content hash of the theme,
+    so a theme is only rendered again after its contents changed.  Each
+    worker process runs its own application on the ``offscreen`` platform
+    and grabs a `WidgetsTab` styled with the theme.
+
+    Parameters
+    ----------
+    catalog : ThemeCatalog
+        the catalog the themes are looked up in.
+    bundle : ThemeBundle, optional
+        packed themes used when the catalog has no such theme.
+    directory : str or os.PathLike, optional
+        the cache directory, by default one in the user cache location.
+    parent : QObject, optional
+        parent object, by default None
+    workers : int
+        maximum number of worker processes.
+    size : QSize
+        size of the thumbnails.
+    """
+
+    rendered = Signal(str, str)
+    _finished = Signal(str, str, str)
+
+    def __init__(self, catalog, bundle=None, directory=None, parent=None,
+                 workers=WORKERS, size=SIZE):
+        """Construct the renderer, the processes start on first use."""
+        super().__init__(parent)
+        self.catalog = catalog
+        self.bundle = bundle
+        self.directory = Path(directory or default_directory())
+        self.workers = workers
+        self.size = size
+        self.pending = {}
+        self.executor = None
+        self._finished.connect(self._report)
+
+    def path(self, name):
+        """Return the thumbnail file of a theme, None if there is none."""
+        entry = self.catalog.get(name)
+        if entry is not None:
+            digest = entry.digest
+        elif self.bundle is not None and name in self.bundle:
+            raw = self.bundle.raw(name)
+            digest = hashlib.blake2b(raw, digest_size=16).hexdigest()
+        else:
+            return None
+        width, height = self.size.width(), self.size.height()
+        return self.directory / f"{digest}-{width}x{height}.png"
+
+    def thumbnail(self, name):
+        """Return the cached thumbnail of a theme, or None."""
+        path = self.path(name)
+        if path is not None and path.exists():
+            return str(path)
+        return None
+
+    def request(self, names):
+        """
+        Emit `rendered` for each theme, rendering missing thumbnails.
+
+        Cached thumbnails are reported immediately, the others once a
+        worker process has rendered them.
+
+        Parameters
+        ----------
+        names : list
+            the theme names.
+        """
+        for name in names:
+            path = self.path(name)
+            if path is None:
+                continue
+            if path.exists():
+                self.rendered.emit(name, str(path))
+            elif str(path) not in self.pending:
+                self._submit(name, path)
+
+    def _submit(self, name, path):
+        """Queue a thumbnail for rendering in a worker process."""
+        entry = self.catalog.entries.get(name)
+        source = entry.path if entry is not None else str(self.bundle.path)
+        if self.executor is None:
+            self.directory.mkdir(parents=True, exist_ok=True)
+            self.executor = concurrent.futures.ProcessPoolExecutor(
+                self.workers,
+                mp_context=multiprocessing.get_context("spawn"),
+                initializer=_start_process,
+            )
+        future = self.executor.submit(
+            render_thumbnail,
+            source,
+            name,
+            str(path),
+            self.size.width(),
+            self.size.height(),
+        )
+        self.pending[str(path)] = future
+        future.add_done_callback(
+            lambda f, n=name, p=str(path): self._done(n, p, f)
+        )
+
+    def _done(self, name, path, future):
+        """Forward the outcome of a render to the thread owning the cache."""
+        error = ""
+        if future.cancelled():
+            error = "cancelled"
+        elif future.exception() is not None:
+            error = str(future.exception())
+        self._finished.emit(name, path, error)
+
+    def _report(self, name, path, error):
+        """Emit `rendered` for a successfully rendered thumbnail."""
+        self.pending.pop(path, None)
+        if not error:
+            self.rendered.emit(name, path)
+
+    def wait(self):
+        """Block until every queued thumbnail is rendered and reported."""
+        while self.pending:
+            concurrent.futures.wait(list(self.pending.values()))
+            QCoreApplication.sendPostedEvents(self)
+
+    def shutdown(self):
+        """Cancel queued renders and stop the worker processes."""
+        if self.executor is not None:
+            for future in list(self.pending.values()):
+                future.cancel()
+            self.executor.shutdown()
+            self.executor = None
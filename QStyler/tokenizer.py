@@ -0,0 +1,221 @@
+#! /usr/bin/python3
+# -*- coding: utf-8 -*-
+
+##############################################################################
+#  Copyright 2022 alexpdev
+#
+#  Licensed under the Apache License, Version 2.0 (the "License");
+#  you may not use this file except in compliance with the License.
+#  You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+#  Unless required by applicable law or agreed to in writing, software
+#  distributed under the License is distributed on an "AS IS" BASIS,
+#  WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#  See the License for the specific language governing permissions and
+#  limitations under the License.
+##############################################################################
+"""Single pass tokenizer for qt style sheets."""
+
+import re
+from typing import Iterator, NamedTuple
+
+SELECTOR = "selector"
+DECLARATION = "declaration"
+COMMENT = "comment"
+END = "end"
+
+# every match skips the leading whitespace and holds a whole token: a
+# comment, or selector or declaration text together with its delimiter,
+# or the text up to an unterminated string and the rest of its line
+_PATTERN = r"""
+    \s*
+    (?:
+        (?P<comment>/\*.*?(?:\*/|\Z))
+      | (?P<text>(?:[^{};/"']+|/(?!\*)|"[^"\n]*"|'[^'\n]*')+)?
+        (?:(?P<delim>[{};])|(?P<quote>["'])[^{};\n]*)?
+    )
+"""
+_SCANNER = re.compile(_PATTERN, re.S | re.X)
+_BYTES_SCANNER = re.compile(_PATTERN.encode("ascii"), re.S | re.X)
+_NEWLINES = re.compile(r"\s*\n\s*")
+
+
+class Token(NamedTuple):
+    """A single lexical unit of a style sheet and its character offsets."""
+
+    kind: str
+    value: str
+    start: int
+    end: int
+
+
+class TokenizeError(Exception):
+    """Raised, or recorded, when the style sheet is malformed."""
+
+    def __init__(self, message, position):
+        """Construct the error with the offset where it was detected."""
+        super().__init__(message)
+        self.message = message
+        self.position = position
+
+    @property
+    def incomplete(self):
+        """Return True if the text ended inside a block or a comment."""
+        return self.message in INCOMPLETE
+
+
+class Diagnostic(NamedTuple):
+    """A problem found in a style sheet and where it is located."""
+
+    line: int
+    column: int
+    message: str
+
+    @classmethod
+    def from_error(cls, text, error):
+        """Locate a recorded `TokenizeError` within `text`."""
+        line, column = location(text, error.position)
+        return cls(line, column, error.message)
+
+    def __str__(self):
+        """Return the diagnostic formatted for display."""
+        return f"line {self.line}, column {self.column}: {self.message}"
+
+
+UNTERMINATED_BLOCK = "unterminated block"
+UNTERMINATED_STRING = "unterminated string"
+UNTERMINATED_COMMENT = "unterminated comment"
+INCOMPLETE = (UNTERMINATED_BLOCK, UNTERMINATED_COMMENT)
+
+
+def line_number(text, position: int) -> int:
+    """Return the 1-based line number for an offset in `text` or a buffer."""
+    if isinstance(text, str):
+        return text.count("\n", 0, position) + 1
+    return bytes(text[:position]).count(b"\n") + 1
+
+
+def location(text, position: int):
+    """Return the 1-based line and column for an offset in `text`."""
+    newline = "\n" if isinstance(text, str) else b"\n"
+    column = position - text.rfind(newline, 0, position)
+    return line_number(text, position), column
+
+
+def _selector(pending, parts):
+    """Return the selector text with its whitespace collapsed."""
+    if parts is not None:
+        pending = " ".join(parts)
+    return " ".join(pending.split()) if pending else ""
+
+
+def _resume(pending, parts, match, value):
+    """
+    Add text that follows a comment, keeping the spaces before it.
+
+    Returns the declaration text, where the pieces are joined directly,
+    and the pieces, which are joined by spaces when they form a selector.
+    """
+    space = match.group()[:match.start(2) - match.start()]
+    if not isinstance(space, str):
+        space = space.decode("utf-8")
+    value = space + value
+    return pending + value, (parts or [pending]) + [value]
+
+
+def tokenize(text, offset: int = 0, errors=None) -> Iterator[Token]:
+    """
+    Scan `text` once and yield selector, declaration, comment and end tokens.
+
+    Bytes like buffers such as memory maps are scanned in place; token
+    values are decoded from utf-8 and offsets are then byte offsets.
+
+    Parameters
+    ----------
+    text : str or bytes-like
+        the style sheet contents.
+    offset : int
+        value added to every reported position, used when `text` is a
+        slice of a larger document.
+    errors : list, optional
+        when given, problems are appended to it as `TokenizeError` and
+        scanning recovers: a '{' inside a block closes the block before
+        the new selector, a stray '}' is skipped, the selector or
+        declaration holding a string left open is dropped up to the next
+        delimiter or line and a block left open at the end of the text is
+        closed.
+
+    Yields
+    ------
+    Token
+        the next token in the document.
+
+    Raises
+    ------
+    TokenizeError
+        when the text is malformed and `errors` is not given.
+    """
+
+    def fail(message, position):
+        if errors is None:
+            raise TokenizeError(message, position)
+        errors.append(TokenizeError(message, position))
+
+    # the tuples are built directly, skipping the slower Token.__new__
+    new = tuple.__new__
+    binary = not isinstance(text, str)
+    scanner = _BYTES_SCANNER if binary else _SCANNER
+    opening, closing = (b"{", b"}") if binary else ("{", "}")
+    inblock = False
+    pending, parts, first = None, None, 0
+    for match in scanner.finditer(text):
+        comment, value, delim, quote = match.groups()
+        if comment is not None:
+            begin = match.start(1) + offset
+            if binary:
+                comment = comment.decode("utf-8")
+            if not comment.endswith("*/", 2):
+                fail(UNTERMINATED_COMMENT, begin)
+                break
+            yield new(Token, (COMMENT, comment, begin, match.end() + offset))
+            continue
+        if value is not None:
+            if binary:
+                value = value.decode("utf-8")
+            if pending is None:
+                pending, first = value, match.start(2) + offset
+            else:
+                pending, parts = _resume(pending, parts, match, value)
+        if quote is not None:
+            fail(UNTERMINATED_STRING, match.start(4) + offset)
+            pending = parts = None
+        if delim is None:
+            continue
+        finish = match.end() + offset
+        if delim == opening:
+            start = finish - 1 if pending is None else first
+            if inblock:
+                fail("unexpected '{'", finish - 1)
+                yield new(Token, (END, "", start, start))
+            value = _selector(pending, parts)
+            yield new(Token, (SELECTOR, value, start, finish))
+            inblock = True
+        elif inblock and pending is not None:
+            value = pending.rstrip()
+            if "\n" in value:
+                value = _NEWLINES.sub(" ", value)
+            yield new(Token, (DECLARATION, value, first, finish))
+        if delim == closing:
+            if inblock:
+                yield new(Token, (END, "}", finish - 1, finish))
+            else:
+                fail("unexpected '}'", finish - 1)
+            inblock = False
+        pending = parts = None
+    else:
+        if inblock:
+            fail(UNTERMINATED_BLOCK, len(text) + offset)
+    if inblock:
+        yield new(Token, (END, "", len(text) + offset, len(text) + offset))
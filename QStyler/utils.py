@@ -18,14 +18,28 @@
 ##############################################################################
 """Utility module."""
 
+import codecs
+import mmap
 import os
+import tempfile
 import webbrowser
-from copy import deepcopy
 from pathlib import Path
 
+from PySide6.QtCore import QStandardPaths
 from PySide6.QtGui import QIcon
 from PySide6.QtWidgets import QApplication
 
+from QStyler.cache import parse_cache
+from QStyler.profiler import profiler
+from QStyler.tokenizer import (DECLARATION, END, SELECTOR, Diagnostic,
+                               TokenizeError, line_number, tokenize)
+
+
+CHUNK_SIZE = 1 << 16
+MAX_PATH = 4096
+PRETTY = (" {\n", "    ", ": ", ";\n", "}\n")
+MINIFIED = ("{", "", ":", ";", "}")
+
 
 class ParsingError(Exception):
     """Parsing Exception."""
@@ -75,94 +89,186 @@ def get_src_dir():
     return Path(__file__).resolve().parent
 
 
+def get_cache_dir():
+    """Return the cache directory of the current user."""
+    location = QStandardPaths.writableLocation(
+        QStandardPaths.StandardLocation.CacheLocation
+    )
+    return Path(location or tempfile.gettempdir())
+
+
 def get_icon(filename=None):
     """Get the path to the window icon."""
     path = get_src_dir() / "icons" / filename
     return QIcon(str(path))
 
 
-def json_to_stylesheet(theme: dict) -> str:
-    """Convert json to qss file."""
-    ssheet = ""
-    for k, v in theme.items():
+def write_stylesheet(theme, write, minified: bool = False) -> int:
+    """
+    Serialize a theme as qss through a write callback.
+
+    The output is passed to `write` piece by piece, so it can be streamed
+    to a file or collected and joined once without building intermediate
+    strings.  Rules without a selector or properties are skipped.
+
+    Parameters
+    ----------
+    theme : dict or list
+        selectors mapped to dictionaries of properties, or a list of
+        (selector, properties) pairs written in order, which may repeat
+        selectors.
+    write : callable
+        called with each piece of text, e.g. ``fd.write`` or
+        ``parts.append``.
+    minified : bool
+        drop the indentation and line breaks; Qt accepts the result.
+
+    Returns
+    -------
+    int
+        the number of rules written.
+    """
+    opening, indent, colon, end, closing = MINIFIED if minified else PRETTY
+    count = 0
+    rules = theme.items() if isinstance(theme, dict) else theme
+    for k, v in rules:
         if not k or not v:
             continue  # pragma: nocover
-        ssheet += k + " {\n"
+        write(k)
+        write(opening)
         for key, val in v.items():
-            ssheet += "    " + key + ": " + val + ";\n"
-        ssheet += "}\n"
-    return ssheet
+            write(indent)
+            write(key)
+            write(colon)
+            write(val)
+            write(end)
+        write(closing)
+        count += 1
+    return count
+
+
+@profiler.timed("serialize")
+def json_to_stylesheet(theme, minified: bool = False) -> str:
+    """Convert json to qss text, see `write_stylesheet`."""
+    parts = []
+    write_stylesheet(theme, parts.append, minified)
+    return "".join(parts)
 
 
 class QssParser:
     """Qt Style Sheet Parser."""
 
-    def __init__(self, path_or_string=None):
+    def __init__(self, text=None, strict=False, urls=False):
         """
         Initialize and construct the qss parser object.
+
+        Parameters
+        ----------
+        text : str, optional
+            style sheet contents to parse immediately.
+        strict : bool
+            raise `ParsingError` at the first problem instead of recovering
+            and recording it in `errors`.
+        urls : bool
+            keep declarations with ``url()`` values, which are skipped by
+            default because theme files do not ship the images.
         """
-        self._line = 0
-        self._total = 0
-        self._lines = []
+        self.strict = strict
+        self.urls = urls
         self.results = {}
         self.collection = []
-        if path_or_string is not None:
-            self.parse(path_or_string)
+        self.errors = []
+        if text is not None:
+            self.parse_string(text)
 
     def parse(self, path_or_string):
         """
         Parse the style sheet and convert it to json, and dictionary styled.
 
+        Only short single line strings are checked against the filesystem,
+        use `parse_string` or `parse_file` when the input type is known.
+
         Parameters
         ----------
-        path_or_string : str
+        path_or_string : str or os.PathLike
             either the path to the file or a string containing stylesheets.
         """
-        self._clear()
-        if os.path.exists(path_or_string):  # pragma: nocover
-            with open(path_or_string, "rt", encoding="utf-8") as fd:
-                self._lines = [i.strip() for i in fd.read().split("\n")]
-        else:
-            self._lines = [i.strip() for i in path_or_string.split("\n")]
-        self._total = len(self._lines)
-        try:
-            self._parse_qss()
-        except IndexError as err:  # pragma: nocover
-            if hasattr(self, "_line"):
-                raise ParsingError(str(self._line)) from err
-        self._compile()
-        return self.results
+        if self._is_path(path_or_string):  # pragma: nocover
+            return self.parse_file(path_or_string)
+        return self.parse_string(path_or_string)
 
-    def _clear(self):
-        """Clear any previous data from last parse."""
-        self._line = self._total = 0
-        self._lines, self.collection = [], []
-        self.results = {}
-
-    @property
-    def current(self):
+    @staticmethod
+    def _is_path(path_or_string):
+        """Return True if the argument names an existing file."""
+        if isinstance(path_or_string, os.PathLike):
+            return True
+        if len(path_or_string) > MAX_PATH or "\n" in path_or_string:
+            return False
+        return os.path.isfile(path_or_string)
+
+    def parse_string(self, text):
         """
-        Return the current line.
+        Parse style sheet contents held in a string.
+
+        Parameters
+        ----------
+        text : str
+            the style sheet contents.
 
         Returns
         -------
-        str
-            The current line
+        dict
+            the parse results.
         """
-        return self._lines[self._line]
+        self._clear()
+        self._parse_buffer(text)
+        return self.results
 
-    def _skipcomment(self):
+    def parse_file(self, path):
         """
-        Skip all lines until parser reaches the end comment token.
+        Parse a style sheet file by scanning a memory map of its contents.
+
+        Parameters
+        ----------
+        path : str or os.PathLike
+            path to the qss file.
+
+        Returns
+        -------
+        dict
+            the parse results.
         """
-        while "*/" not in self.current:
-            self._line += 1
-        self._line += 1
+        self._clear()
+        with open(path, "rb") as fd:
+            if os.fstat(fd.fileno()).st_size == 0:
+                return self.results
+            with mmap.mmap(fd.fileno(), 0, access=mmap.ACCESS_READ) as buf:
+                self._parse_buffer(buf)
+        return self.results
+
+    @profiler.timed("parse")
+    def _parse_buffer(self, text):
+        """Parse a string or buffer and compile the results."""
+        errors = None if self.strict else []
+        try:
+            self._parse_qss(text, errors)
+        except TokenizeError as err:
+            raise ParsingError(str(line_number(text, err.position))) from err
+        self._compile()
+        if errors:
+            self.errors = [Diagnostic.from_error(text, err) for err in errors]
+
+    def _clear(self):
+        """Clear any previous data from last parse."""
+        self.collection, self.errors = [], []
+        self.results = {}
 
     def _add_widgets(self, widgets, props):
         """
         Add widgets to the the master collection.
 
+        The declaration block is stored once for the whole selector group.
+
         Parameters
         ----------
         widgets : str
@@ -170,95 +276,151 @@ class QssParser:
         props : dict
             the property names and values
         """
-        widget_str = "".join(widgets)
-        widgets = widget_str.split(",")
-        for widget in widgets:
-            try:
-                self.collection.append({widget.strip(): deepcopy(props)})
-            except IndexError:  # pragma: nocover
-                return
+        self.collection.append((self.split_selectors(widgets), props))
+
+    def rules(self):
+        """
+        Return the rule blocks in source order.
+
+        Returns
+        -------
+        list
+            (selector group, properties) pairs; unlike `results`, repeated
+            selectors keep every one of their blocks.
+        """
+        return [
+            (", ".join(selectors), props)
+            for selectors, props in self.collection
+        ]
 
     @staticmethod
-    def _serialize_prop(line):
+    def split_selectors(group):
         """
-        Normalize property string into name and value.
+        Split a comma separated selector group into single selectors.
 
         Parameters
         ----------
-        line : str
-            the current line
+        group : str
+            the selector group of a rule block.
 
         Returns
         -------
-        dict
-            the key,value pair of the normalized results
+        list
+            the stripped selectors.
         """
-        try:
-            group = line.split(":")
-            key, val = group[0].strip(), ":".join(group[1:]).strip()
-            if "url" in val:
-                return {}
-            if val.endswith(";"):
-                val = val[:-1]
-            return {key: val}
-        except IndexError:  # pragma: nocover
-            return {}
-
-    def _parse_qss(self):
+        return [selector.strip() for selector in group.split(",")]
+
+    @classmethod
+    def rule_blocks(cls, text, offset=0, errors=None, urls=False):
+        """
+        Parse `text` and yield each rule block as soon as it is closed.
+
+        Parameters
+        ----------
+        text : str
+            the style sheet contents.
+        offset : int
+            value added to the reported spans.
+        errors : list, optional
+            collects problems and recovers from them, see `tokenize`.
+        urls : bool
+            keep declarations with ``url()`` values.
+
+        Yields
+        ------
+        tuple
+            the selector group, its properties and the (start, end) span.
         """
-        Parse the content of the qss file one line at a time.
+        selector, props, start = "", {}, 0
+        for kind, value, begin, end in tokenize(text, offset, errors):
+            if kind == DECLARATION:
+                key, _, val = value.partition(":")
+                key, val = key.rstrip(), val.lstrip()
+                if key and (urls or "url" not in val):
+                    props[key] = val
+            elif kind == SELECTOR:
+                selector, props, start = value, {}, begin
+            elif kind == END:
+                yield selector, props, (start, end)
+
+    @classmethod
+    def iter_rules(cls, source, chunk_size=CHUNK_SIZE):
         """
-        inblock = False
-        widgets, props = [], {}
-        while self._line < self._total:
-            if self.current == "":
-                self._line += 1
-                continue
-            if "/*" in self.current:
-                self._skipcomment()
-                continue
-            if "{" in self.current:
-                sblock = self.current.index("{")
-                widgets.append(self.current[:sblock])
-                if "}" in self.current:
-                    eblock = self.current.index("}")
-                    prop = self.current[sblock + 1: eblock]
-                    prop = self._serialize_prop(prop)
-                    if prop:
-                        props.update(prop)
-                    self._add_widgets(widgets, props)
-                    widgets, props = [], {}
-                    self._line += 1
-                    continue
-                self._line += 1
-                inblock = True
-                continue
-            if "}" in self.current:
-                inblock = False
-                self._add_widgets(widgets, props)
-                self._line += 1
-                widgets, props = [], {}
-                continue
-            if inblock:
-                parts = []
-                while ";" not in self.current:
-                    parts.append(self.current.strip())
-                    self._line += 1
-                parts.append(self.current.strip())
-                prop = self._serialize_prop(" ".join(parts))
-                if prop:
-                    props.update(prop)
-                self._line += 1
-                continue
-            widgets.append(self.current)
-            self._line += 1
+        Stream the rules of a style sheet without reading it all at once.
+
+        The source is read `chunk_size` characters at a time and only the
+        text following the last complete rule block is kept between reads,
+        so memory use does not grow with the size of the input.
+
+        Parameters
+        ----------
+        source : str or os.PathLike or file object
+            path to a qss file or an open file object in text or binary mode.
+        chunk_size : int
+            number of characters read from the source at a time.
+
+        Yields
+        ------
+        tuple
+            the selector, its properties and the (start, end) span of the
+            rule block in the source.
+
+        Raises
+        ------
+        ParsingError
+            when the source ends inside a block or a comment.
+        """
+        if isinstance(source, (str, os.PathLike)):
+            with open(source, "rt", encoding="utf-8") as fd:
+                yield from cls.iter_rules(fd, chunk_size)
+            return
+        decoder = codecs.getincrementaldecoder("utf-8")()
+        buffer, consumed, lines, eof = "", 0, 0, False
+        while not eof:
+            chunk = source.read(chunk_size)
+            eof = not chunk
+            if isinstance(chunk, bytes):
+                chunk = decoder.decode(chunk, final=eof)
+            buffer += chunk
+            done = 0
+            try:
+                for group, props, span in cls.rule_blocks(buffer, consumed):
+                    done = span[1] - consumed
+                    for selector in cls.split_selectors(group):
+                        yield selector, dict(props), span
+            except TokenizeError as err:
+                if eof:
+                    line = lines + line_number(buffer, err.position - consumed)
+                    raise ParsingError(str(line)) from err
+            lines += buffer.count("\n", 0, done)
+            buffer, consumed = buffer[done:], consumed + done
+
+    def _parse_qss(self, text, errors=None):
+        """
+        Parse the content of the qss text in a single pass over its tokens.
+
+        Parameters
+        ----------
+        text : str or bytes-like
+            the style sheet contents.
+        errors : list, optional
+            collects problems and recovers from them.
+        """
+        blocks = self.rule_blocks(text, errors=errors, urls=self.urls)
+        for widgets, props, _ in blocks:
+            self._add_widgets(widgets, props)
 
     def _compile(self):
         """
         Gather and group all results into one dictionary.
+
+        Each selector gets a shallow copy of its block, so the results are
+        plain json objects that can be changed without touching the other
+        selectors of a group.
         """
-        for row in self.collection:
-            self.results.update(row)
+        for widgets, props in self.collection:
+            for widget in widgets:
+                self.results[widget] = dict(props)
 
 
 def open_github_browser():
@@ -266,11 +428,70 @@ def open_github_browser():
     webbrowser.open("https://github.com/alexpdev/QStyler")  # pragma: nocover
 
 
-def apply_stylesheet(text):
-    """Apply theme to current app stylesheet."""
+def parse_stylesheet(text, urls=False):
+    """
+    Return a parser for `text`, reusing a cached parse when possible.
+
+    Parameters
+    ----------
+    text : str
+        the style sheet contents.
+    urls : bool
+        keep declarations with ``url()`` values, see `QssParser`.
+
+    Returns
+    -------
+    QssParser
+        the shared, read only parser holding the results and errors.
+    """
+    kind = "parser.urls" if urls else "parser"
+    return parse_cache.fetch(text, kind, lambda: QssParser(text, urls=urls))
+
+
+def recover_stylesheet(text):
+    """
+    Return the part of a style sheet with errors that Qt can apply.
+
+    The recovered rule blocks are written in source order with all their
+    declarations, including ``url()`` values, so repeated selectors and
+    the cascade behave as they would in the original text.
+
+    Parameters
+    ----------
+    text : str
+        the style sheet contents.
+
+    Returns
+    -------
+    str
+        the minified style sheet.
+    """
+    rules = parse_stylesheet(text, urls=True).rules()
+    return json_to_stylesheet(rules, minified=True)
+
+
+@profiler.timed("apply")
+def apply_stylesheet(text, results=None):
+    """
+    Apply theme to current app stylesheet.
+
+    Parameters
+    ----------
+    text : str
+        the style sheet contents.
+    results : dict, optional
+        already parsed results for `text`, parsed here when omitted.
+        When `text` had to be parsed and contains errors, only the rules
+        recovered from it are applied, see `recover_stylesheet`.
+    """
     if not text:
         QApplication.instance().setStyleSheet("")
         return
-    parser = QssParser(text)
-    if parser.results:
-        QApplication.instance().setStyleSheet(text)
+    if results is None:
+        parser = parse_stylesheet(text)
+        results = parser.results
+        if parser.errors:
+            text = recover_stylesheet(text)
+    if results:
+        with profiler.span("apply.setStyleSheet"):
+            QApplication.instance().setStyleSheet(text)
@@ -0,0 +1,141 @@
+#! /usr/bin/python3
+# -*- coding: utf-8 -*-
+
+##############################################################################
+#  Copyright 2022 alexpdev
+#
+#  Licensed under the Apache License, Version 2.0 (the "License");
+#  you may not use this file except in compliance with the License.
+#  You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+#  Unless required by applicable law or agreed to in writing, software
+#  distributed under the License is distributed on an "AS IS" BASIS,
+#  WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#  See the License for the specific language governing permissions and
+#  limitations under the License.
+##############################################################################
+"""Hot reload of themes changed outside of the application."""
+
+import os
+
+from PySide6.QtCore import QFileSystemWatcher, QObject, QTimer, Signal
+
+from QStyler.catalog import SUFFIX
+
+DEBOUNCE = 200
+
+
+class ThemeWatcher(QObject):
+    """
+    Keep a theme catalog in sync with changes made by other programs.
+
+    The themes directory is watched for files being added, removed or
+    replaced, and the current theme file for changes to its contents.
+    Events are collected until none arrived for a short while.  Added and
+    removed themes are found by comparing the file names in the directory
+    with the catalog, so only new files and the watched file are read;
+    other modified themes are re-indexed when they are next looked up.
+
+    Parameters
+    ----------
+    catalog : ThemeCatalog
+        the catalog to update.
+    parent : QObject, optional
+        parent object, by default None
+    delay : int
+        milliseconds without events before the changes are processed.
+    """
+
+    themesChanged = Signal(list, list, list)
+
+    def __init__(self, catalog, parent=None, delay=DEBOUNCE):
+        """Construct the watcher and start watching the directory."""
+        super().__init__(parent)
+        self.catalog = catalog
+        self.watcher = QFileSystemWatcher(self)
+        self.watcher.addPath(str(catalog.directory))
+        self.current = None
+        self.files = set()
+        self.timer = QTimer(self)
+        self.timer.setSingleShot(True)
+        self.timer.setInterval(delay)
+        self.timer.timeout.connect(self.process)
+        self.watcher.directoryChanged.connect(self._on_directory)
+        self.watcher.fileChanged.connect(self._on_file)
+
+    def watch_theme(self, name):
+        """Watch the file of theme `name` instead of the previous one."""
+        if self.current is not None:
+            self.watcher.removePath(self.current)
+        entry = self.catalog.entries.get(name)
+        self.current = entry.path if entry is not None else None
+        if self.current is not None:
+            self.watcher.addPath(self.current)
+
+    def _on_directory(self, _):
+        """Schedule processing after a change to the directory."""
+        self.timer.start()
+
+    def _on_file(self, path):
+        """Schedule processing after a change to a watched file."""
+        self.files.add(path)
+        self.timer.start()
+
+    def _listing(self):
+        """Return the names of the theme files in the directory."""
+        names = set()
+        with os.scandir(self.catalog.directory) as it:
+            for item in it:
+                name, ext = os.path.splitext(item.name)
+                if ext != SUFFIX or name.startswith("."):
+                    continue
+                try:
+                    if item.is_file():
+                        names.add(name)
+                except OSError:  # pragma: nocover
+                    continue
+        return names
+
+    def process(self):
+        """
+        Apply the collected changes to the catalog.
+
+        Returns
+        -------
+        tuple
+            the added, removed and changed theme names, also emitted
+            through `themesChanged` when any of them is not empty.
+        """
+        self.timer.stop()
+        files, self.files = self.files, set()
+        names = self._listing()
+        known = set(self.catalog.entries)
+        added = [
+            name for name in sorted(names - known)
+            if self.catalog.update(name) is not None
+        ]
+        removed = sorted(known - names)
+        changed = []
+        for name in removed:
+            self.catalog.remove(name)
+        if self.current is not None:
+            files.add(self.current)
+        for path in files:
+            name = os.path.splitext(os.path.basename(path))[0]
+            entry = self.catalog.entries.get(name)
+            if entry is None or name in added:
+                continue
+            current = self.catalog.get(name)
+            if current is None:
+                removed.append(name)
+            elif current != entry:
+                changed.append(name)
+        current = self.current
+        if current is not None and current not in self.watcher.files():
+            if os.path.exists(current):
+                self.watcher.addPath(current)
+        if added or removed or changed:
+            self.themesChanged.emit(added, removed, changed)
+        return added, removed, changed
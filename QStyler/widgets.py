@@ -30,15 +30,15 @@ from PySide6.QtWidgets import (QCheckBox, QComboBox, QCommandLinkButton, QDial,
                                QToolBar, QToolBox, QToolButton, QVBoxLayout,
                                QWidget)
 
+from QStyler.lazy import LazyTab
 from QStyler.utils import Lorem
 
 
-class WidgetsTab(QWidget):
+class WidgetsTab(LazyTab):
     """Tab holding all of the widgets for example style will look like."""
 
-    def __init__(self, parent=None):
-        """Initialize the widgets tab."""
-        super().__init__(parent=parent)
+    def build(self):
+        """Build the widgets of the tab."""
         lorem = Lorem()
         self.hlayout = QHBoxLayout()
         self.setLayout(self.hlayout)
@@ -21,16 +21,22 @@
 import sys
 from typing import Optional
 
-from PySide6.QtWidgets import (QApplication, QHBoxLayout, QMainWindow,
-                               QTabWidget, QVBoxLayout, QWidget)
+from PySide6.QtCore import QTimer
+from PySide6.QtWidgets import (QApplication, QFileDialog, QHBoxLayout,
+                               QLabel, QMainWindow, QTabWidget, QVBoxLayout,
+                               QWidget)
 
 from QStyler.collectionsTab import CollectionsTab
 from QStyler.editorTab import EditorsTab
 from QStyler.menubar import MenuBar
+from QStyler.profiler import profiler
 from QStyler.styler import StylerTab
 from QStyler.utils import get_icon
 from QStyler.widgets import WidgetsTab
 
+HUD_OPERATIONS = ("parse.incremental", "apply.setStyleSheet", "theme.load")
+HUD_INTERVAL = 1000
+
 
 class MainWindow(QMainWindow):
     """
@@ -62,6 +68,12 @@ class MainWindow(QMainWindow):
         self.setWindowIcon(get_icon("QStylerIcon.png"))
         self.menubar = MenuBar(self)
         self.statusbar = self.statusBar()
+        self.hud = QLabel()
+        self.hud.setHidden(True)
+        self.statusbar.addPermanentWidget(self.hud)
+        self.hud_timer = QTimer(self)
+        self.hud_timer.setInterval(HUD_INTERVAL)
+        self.hud_timer.timeout.connect(self.update_latency)
         self.setMenuBar(self.menubar)
         self.add_widgets()
         self.menubar.optionsMenu.resetClicked.connect(
@@ -79,6 +91,9 @@ class MainWindow(QMainWindow):
         self.styler.toolbar.live_action.triggered.connect(
             self.disable_menu_buttons
         )
+        self.menubar.fileMenu.exportResourceClicked.connect(
+            self.styler.export_resource
+        )
 
     def disable_menu_buttons(self, state):
         """Disable options in menu when live view is active."""
@@ -89,6 +104,31 @@ class MainWindow(QMainWindow):
             self.menubar.optionsMenu.loadTheme.setDisabled(False)
             self.menubar.optionsMenu.previewTheme.setDisabled(False)
 
+    def show_latency(self, state):
+        """Show or hide the latency percentiles in the status bar."""
+        profiler.enabled = state
+        self.hud.setHidden(not state)
+        if state:
+            self.update_latency()
+            self.hud_timer.start()
+        else:
+            self.hud_timer.stop()
+
+    def update_latency(self):
+        """Refresh the p50/p95/p99 latencies shown in the status bar."""
+        self.hud.setText(
+            "  |  ".join(profiler.describe(name) for name in HUD_OPERATIONS)
+        )
+
+    def export_trace(self):  # pragma: nocover
+        """Save the recorded operations as a Chrome trace file."""
+        path, _ = QFileDialog.getSaveFileName(
+            self, caption="Export Trace", filter="Trace (*.json)"
+        )
+        if path:
+            profiler.export_trace(path)
+            self.statusbar.showMessage(f"Trace saved to {path}", 2000)
+
     def add_widgets(self):
         """Add widgets to the main window."""
         self.styler = StylerTab(parent=self)
@@ -99,6 +139,15 @@ class MainWindow(QMainWindow):
         self.tabWidget.addTab(self.widgets, "Widgets")
         self.tabWidget.addTab(self.editors, "Editors")
         self.tabWidget.addTab(self.collections, "Collections")
+        self.styler.scope.panes = [
+            self.widgets,
+            self.editors,
+            self.collections,
+        ]
+        for pane in self.styler.scope.panes:
+            pane.built.connect(
+                lambda pane=pane: self.styler.scope.refresh(pane)
+            )
         self.styler.extend.connect(self.on_extend)
 
     def on_extend(self, state):
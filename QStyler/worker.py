@@ -0,0 +1,94 @@
+#! /usr/bin/python3
+# -*- coding: utf-8 -*-
+
+##############################################################################
+#  Copyright 2022 alexpdev
+#
+#  Licensed under the Apache License, Version 2.0 (the "License");
+#  you may not use this file except in compliance with the License.
+#  You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+#  Unless required by applicable law or agreed to in writing, software
+#  distributed under the License is distributed on an "AS IS" BASIS,
+#  WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#  See the License for the specific language governing permissions and
+#  limitations under the License.
+##############################################################################
+"""Background parsing of style sheets."""
+
+from PySide6.QtCore import QCoreApplication, QObject, QThreadPool, Signal
+
+from QStyler.incremental import IncrementalParser
+
+
+class ParseWorker(QObject):
+    """
+    Index style sheets on a thread pool and deliver the newest result.
+
+    Every submitted text is tagged with a generation number.  Jobs that
+    were superseded before they started are skipped and results of
+    superseded jobs are dropped, so `finished` is only emitted for the
+    most recent submission, on the thread that owns the worker.
+
+    Parameters
+    ----------
+    parent : QObject, optional
+        parent object, by default None
+    """
+
+    finished = Signal(str, object)
+    _delivered = Signal(int, str, object)
+
+    def __init__(self, parent=None):
+        """Construct the worker and its thread pool."""
+        super().__init__(parent)
+        self.pool = QThreadPool(self)
+        self.generation = 0
+        self.busy = False
+        self._delivered.connect(self._deliver)
+
+    def submit(self, text):
+        """
+        Start indexing `text`, superseding any earlier submission.
+
+        Parameters
+        ----------
+        text : str
+            the style sheet contents.
+
+        Returns
+        -------
+        int
+            the generation number of the job.
+        """
+        self.generation += 1
+        generation = self.generation
+        self.busy = True
+        self.pool.start(lambda: self._run(generation, text))
+        return generation
+
+    def cancel(self):
+        """Drop the results of every job submitted so far."""
+        self.generation += 1
+        self.busy = False
+
+    def wait(self, msecs=-1):
+        """Block until running jobs finish and deliver the newest result."""
+        self.pool.waitForDone(msecs)
+        QCoreApplication.sendPostedEvents(self)
+
+    def _run(self, generation, text):
+        """Index `text` on a pool thread unless already superseded."""
+        if generation != self.generation:
+            return
+        index = IncrementalParser.index(text)
+        self._delivered.emit(generation, text, index)
+
+    def _deliver(self, generation, text, index):
+        """Forward a result to listeners if it is still current."""
+        if generation != self.generation:
+            return
+        self.busy = False
+        self.finished.emit(text, index)
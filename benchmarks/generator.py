@@ -0,0 +1,95 @@
+#! /usr/bin/python3
+# -*- coding: utf-8 -*-
+
+##############################################################################
+#  Copyright 2022 alexpdev
+#
+#  Licensed under the Apache License, Version 2.0 (the "License");
+#  you may not use this file except in compliance with the License.
+#  You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+#  Unless required by applicable law or agreed to in writing, software
+#  distributed under the License is distributed on an "AS IS" BASIS,
+#  WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#  See the License for the specific language governing permissions and
+#  limitations under the License.
+##############################################################################
+"""Synthetic style sheet generator for benchmarks."""
+
+import json
+import random
+
+from QStyler.utils import get_src_dir
+
+with open(get_src_dir() / "data" / "data.json", "rt", encoding="utf8") as fd:
+    DATA = json.load(fd)
+WIDGETS = sorted((set(DATA["controls"]) | set(DATA["states"])) - {"*"})
+PROPERTIES = DATA["properties"]
+STATES = DATA["states"]["*"]
+VALUES = [
+    "#{color:06x}",
+    "{size}px",
+    "{size}px solid #{color:06x}",
+    "rgba({size}, 12, 200, 0.5)",
+    "qlineargradient(x1: 0, y1: 0, x2: 0, y2: 1, stop: 0 #{color:06x}, "
+    "stop: 1 #000000)",
+]
+
+
+def _selector(rng, index):
+    """Return a random selector made unique by `index`."""
+    widget = rng.choice(WIDGETS)
+    selector = f"{widget}#item{index}"
+    if rng.random() < 0.5:
+        selector += ":" + rng.choice(STATES)
+    return selector
+
+
+def _value(rng):
+    """Return a random property value."""
+    return rng.choice(VALUES).format(
+        color=rng.randrange(0x1000000), size=rng.randrange(256)
+    )
+
+
+def generate(
+    rules, group=1, comments=0.0, multiline=0.0, declarations=6, seed=0
+):
+    """
+    Generate a synthetic style sheet.
+
+    Parameters
+    ----------
+    rules : int
+        number of selectors in the sheet.
+    group : int
+        number of selectors sharing each rule block.
+    comments : float
+        probability of a comment preceding each block.
+    multiline : float
+        probability of a declaration being split over several lines.
+    declarations : int
+        number of declarations in each block.
+    seed : int
+        seed for the random generator, equal seeds give equal sheets.
+
+    Returns
+    -------
+    str
+        the style sheet contents.
+    """
+    rng = random.Random(seed)
+    parts = []
+    for start in range(0, rules, group):
+        if rng.random() < comments:
+            parts.append(f"/* block {start}\n   generated */\n")
+        count = min(group, rules - start)
+        selectors = [_selector(rng, start + i) for i in range(count)]
+        parts.append(",\n".join(selectors) + " {\n")
+        for prop in rng.sample(PROPERTIES, declarations):
+            sep = ":\n        " if rng.random() < multiline else ": "
+            parts.append(f"    {prop}{sep}{_value(rng)};\n")
+        parts.append("}\n")
+    return "".join(parts)
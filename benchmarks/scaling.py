@@ -0,0 +1,76 @@
+#! /usr/bin/python3
+# -*- coding: utf-8 -*-
+
+##############################################################################
+#  Copyright 2022 alexpdev
+#
+#  Licensed under the Apache License, Version 2.0 (the "License");
+#  you may not use this file except in compliance with the License.
+#  You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+#  Unless required by applicable law or agreed to in writing, software
+#  distributed under the License is distributed on an "AS IS" BASIS,
+#  WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#  See the License for the specific language governing permissions and
+#  limitations under the License.
+##############################################################################
+"""
+Size scaling benchmark for the qss parser.
+
+Run with ``python -m benchmarks.scaling``.  Each row doubles the number of
+rules; a linear parser keeps the per rule cost roughly constant.  Every
+sheet is also parsed by the former line based parser, see
+`benchmarks.legacy`, to show the gain of the current one.
+"""
+
+import sys
+import time
+
+from benchmarks.generator import generate
+from benchmarks.legacy import LineParser
+from QStyler.utils import QssParser
+
+PROFILES = {
+    "flat": {},
+    "grouped": {"group": 2, "comments": 0.5, "multiline": 0.25},
+}
+
+
+def make_sheet(rules, profile="grouped"):
+    """Return a style sheet containing `rules` generated selectors."""
+    return generate(rules, **PROFILES[profile])
+
+
+def best(parser, sheet, repeat=3):
+    """Return the fastest of `repeat` parses of `sheet` in seconds."""
+    seconds = float("inf")
+    for _ in range(repeat):
+        begin = time.perf_counter()
+        parser(sheet)
+        seconds = min(seconds, time.perf_counter() - begin)
+    return seconds
+
+
+def run(start=1000, steps=8, repeat=3):
+    """Print the parse times of both parsers for sheets of doubling size."""
+    print(
+        f"{'profile':>8} {'rules':>10} {'legacy s':>10} {'seconds':>10}"
+        f" {'speedup':>8} {'us/rule':>8}"
+    )
+    for profile in PROFILES:
+        rules = start
+        for _ in range(steps):
+            sheet = make_sheet(rules, profile)
+            legacy = best(LineParser, sheet, repeat)
+            elapsed = best(QssParser, sheet, repeat)
+            print(
+                f"{profile:>8} {rules:>10} {legacy:>10.4f} {elapsed:>10.4f}"
+                f" {legacy / elapsed:>7.2f}x {elapsed / rules * 1e6:>8.2f}"
+            )
+            rules *= 2
+
+
+if __name__ == "__main__":
+    run(*[int(arg) for arg in sys.argv[1:]])
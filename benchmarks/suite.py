@@ -0,0 +1,304 @@
+#! /usr/bin/python3
+# -*- coding: utf-8 -*-
+
+##############################################################################
+#  Copyright 2022 alexpdev
+#
+#  Licensed under the Apache License, Version 2.0 (the "License");
+#  you may not use this file except in compliance with the License.
+#  You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+#  Unless required by applicable law or agreed to in writing, software
+#  distributed under the License is distributed on an "AS IS" BASIS,
+#  WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#  See the License for the specific language governing permissions and
+#  limitations under the License.
+##############################################################################
+"""
+Headless benchmark suite for the parser, serializer and theme loading.
+
+Run with ``python -m benchmarks.suite``, which generates sheets of 1k,
+10k and 100k rules, add ``--full`` to include 1M rules.  Results can be
+saved with ``--output baseline.json`` and later runs compared against it
+with ``--compare baseline.json``; the exit status is 1 when a case
+regressed.
+"""
+
+import argparse
+import json
+import os
+import platform
+import sys
+import time
+import tracemalloc
+
+from PySide6.QtWidgets import QApplication
+
+from benchmarks.generator import generate
+from QStyler.cache import parse_cache
+from QStyler.styler import StylerTab
+from QStyler.utils import QssParser, get_src_dir, json_to_stylesheet
+from QStyler.version import __version__
+
+os.environ.setdefault("QT_QPA_PLATFORM", "offscreen")
+
+PROFILES = {
+    "flat": {},
+    "grouped": {"group": 8},
+    "commented": {"comments": 0.5, "multiline": 0.3},
+}
+SIZES = [1000, 10000, 100000]
+FULL_SIZES = SIZES + [1000000]
+THRESHOLD = 0.1
+
+
+def measure(name, func, rules, size, repeat=3):
+    """
+    Time `func` and record its peak traced memory.
+
+    Parameters
+    ----------
+    name : str
+        the name of the benchmark case.
+    func : callable
+        the code being measured.
+    rules : int
+        number of rules processed by one call.
+    size : int
+        number of characters processed by one call.
+    repeat : int
+        number of timed calls, the fastest one is reported.
+
+    Returns
+    -------
+    dict
+        the benchmark record.
+    """
+    seconds = float("inf")
+    for _ in range(repeat):
+        begin = time.perf_counter()
+        func()
+        seconds = min(seconds, time.perf_counter() - begin)
+    tracemalloc.start()
+    func()
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    return {
+        "name": name,
+        "rules": rules,
+        "bytes": size,
+        "seconds": seconds,
+        "rules_per_s": rules / seconds if seconds else 0.0,
+        "mb_per_s": size / seconds / 1e6 if seconds else 0.0,
+        "peak_mb": peak / 1e6,
+    }
+
+
+def concat_stylesheet(theme):
+    """Serialize a theme by string concatenation, the former serializer."""
+    ssheet = ""
+    for k, v in theme.items():
+        if not k or not v:
+            continue
+        ssheet += k + " {\n"
+        for key, val in v.items():
+            ssheet += "    " + key + ": " + val + ";\n"
+        ssheet += "}\n"
+    return ssheet
+
+
+def load_themes():
+    """Return the bundled themes as a mapping of name to qss text."""
+    themes = {}
+    for path in sorted((get_src_dir() / "themes").glob("*.json")):
+        with open(path, "rt", encoding="utf8") as fd:
+            themes[path.stem] = json_to_stylesheet(json.load(fd))
+    return themes
+
+
+def synthetic_cases(sizes, repeat):
+    """Yield parse and serialize records for the generated sheets."""
+    for profile, options in PROFILES.items():
+        for rules in sizes:
+            text = generate(rules, **options)
+            results = QssParser(text).results
+            yield measure(
+                f"parse/{profile}/{rules}",
+                lambda text=text: QssParser(text),
+                rules,
+                len(text),
+                repeat,
+            )
+            yield measure(
+                f"serialize/{profile}/{rules}",
+                lambda results=results: json_to_stylesheet(results),
+                rules,
+                len(text),
+                repeat,
+            )
+            yield measure(
+                f"serialize-concat/{profile}/{rules}",
+                lambda results=results: concat_stylesheet(results),
+                rules,
+                len(text),
+                repeat,
+            )
+
+
+def theme_cases(repeat, gui=True):
+    """Yield records for the bundled theme corpus."""
+    themes = load_themes()
+    parsed = {name: QssParser(text).results for name, text in themes.items()}
+    rules = sum(len(results) for results in parsed.values())
+    size = sum(len(text) for text in themes.values())
+
+    def parse_all():
+        for text in themes.values():
+            QssParser(text)
+
+    def serialize_all(serializer=json_to_stylesheet):
+        for results in parsed.values():
+            serializer(results)
+
+    def minify_all():
+        for results in parsed.values():
+            json_to_stylesheet(results, minified=True)
+
+    def concat_all():
+        serialize_all(concat_stylesheet)
+
+    yield measure("parse/themes", parse_all, rules, size, repeat)
+    yield measure("serialize/themes", serialize_all, rules, size, repeat)
+    yield measure("serialize-min/themes", minify_all, rules, size, repeat)
+    yield measure("serialize-concat/themes", concat_all, rules, size, repeat)
+    if gui:
+        yield theme_load_case(list(themes), rules, size, repeat)
+
+
+def theme_load_case(names, rules, size, repeat):
+    """Measure StylerTab.set_current_theme over every bundled theme."""
+    app = QApplication.instance() or QApplication(sys.argv[:1])
+    tab = StylerTab()
+
+    def load_all():
+        parse_cache.clear()
+        tab.themes.clear()
+        for name in names:
+            tab.set_current_theme(name)
+            tab.worker.wait()
+        app.setStyleSheet("")
+
+    record = measure("theme_load/themes", load_all, rules, size, repeat)
+    tab.deleteLater()
+    return record
+
+
+def compare(records, baseline, threshold=THRESHOLD):
+    """
+    Print the change of every case against a saved baseline.
+
+    Parameters
+    ----------
+    records : list
+        the current benchmark records.
+    baseline : dict
+        the contents of a saved result file.
+    threshold : float
+        relative slowdown above which a case counts as a regression.
+
+    Returns
+    -------
+    list
+        the names of the cases that regressed.
+    """
+    previous = {record["name"]: record for record in baseline["results"]}
+    regressions = []
+    for record in records:
+        old = previous.get(record["name"])
+        if old is None or not old["seconds"]:
+            continue
+        ratio = record["seconds"] / old["seconds"]
+        flag = ""
+        if ratio > 1 + threshold:
+            regressions.append(record["name"])
+            flag = "  REGRESSION"
+        print(f"{record['name']:<32} {ratio:>8.2f}x{flag}")
+    return regressions
+
+
+def report(records):
+    """Print the benchmark records as a table."""
+    print(
+        f"{'case':<32} {'rules/s':>12} {'MB/s':>8} "
+        f"{'seconds':>9} {'peak MB':>9}"
+    )
+    for record in records:
+        print(
+            f"{record['name']:<32} {record['rules_per_s']:>12.0f} "
+            f"{record['mb_per_s']:>8.2f} {record['seconds']:>9.4f} "
+            f"{record['peak_mb']:>9.2f}"
+        )
+
+
+def run(sizes=None, repeat=3, gui=True):
+    """
+    Run every benchmark case.
+
+    Parameters
+    ----------
+    sizes : list, optional
+        rule counts of the generated sheets.
+    repeat : int
+        number of timed calls per case.
+    gui : bool
+        include the cases that need a QApplication.
+
+    Returns
+    -------
+    list
+        the benchmark records.
+    """
+    records = list(synthetic_cases(sizes or SIZES, repeat))
+    records.extend(theme_cases(repeat, gui))
+    return records
+
+
+def main(args=None):
+    """Command line entry point for the benchmark suite."""
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--rules", type=int, nargs="+")
+    parser.add_argument(
+        "--full", action="store_true", help="include sheets of 1M rules"
+    )
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--no-gui", action="store_true")
+    parser.add_argument("--output", help="save results to a json file")
+    parser.add_argument("--compare", help="baseline json file to diff")
+    parser.add_argument("--threshold", type=float, default=THRESHOLD)
+    options = parser.parse_args(args)
+    sizes = options.rules or (FULL_SIZES if options.full else SIZES)
+    records = run(sizes, options.repeat, not options.no_gui)
+    report(records)
+    if options.output:
+        with open(options.output, "wt", encoding="utf8") as fd:
+            json.dump(
+                {
+                    "version": __version__,
+                    "python": platform.python_version(),
+                    "results": records,
+                },
+                fd,
+                indent=4,
+            )
+    if options.compare:
+        with open(options.compare, "rt", encoding="utf8") as fd:
+            baseline = json.load(fd)
+        if compare(records, baseline, options.threshold):
+            return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,71 @@
+#! /usr/bin/python3
+# -*- coding: utf-8 -*-
+
+##############################################################################
+#  Copyright 2022 alexpdev
+#
+#  Licensed under the Apache License, Version 2.0 (the "License");
+#  you may not use this file except in compliance with the License.
+#  You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+#  Unless required by applicable law or agreed to in writing, software
+#  distributed under the License is distributed on an "AS IS" BASIS,
+#  WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#  See the License for the specific language governing permissions and
+#  limitations under the License.
+##############################################################################
+"""Module for testing the benchmark suite."""
+
+import pytest
+
+from benchmarks import scaling, suite
+from benchmarks.generator import generate
+from benchmarks.legacy import LineParser
+from QStyler.utils import QssParser
+
+
+def test_generator_profiles():
+    """Test generated sheets are reproducible and parse completely."""
+    text = generate(40, group=4, comments=0.5, multiline=0.5, seed=3)
+    assert text == generate(40, group=4, comments=0.5, multiline=0.5, seed=3)
+    assert "/*" in text
+    assert len(QssParser(text).results) == 40
+
+
+def test_suite_compare():
+    """Test a headless run and the regression check against a baseline."""
+    records = suite.run(sizes=[20], repeat=1, gui=False)
+    names = [record["name"] for record in records]
+    assert "parse/grouped/20" in names and "serialize/themes" in names
+    baseline = {"results": [dict(record) for record in records]}
+    for record in baseline["results"]:
+        record["seconds"] /= 10
+    assert suite.compare(records, baseline) == names
+
+
+@pytest.mark.parametrize(
+    "args, sizes",
+    [
+        ([], suite.SIZES),
+        (["--full"], suite.FULL_SIZES),
+        (["--full", "--rules", "5"], [5]),
+    ],
+)
+def test_suite_sizes(monkeypatch, args, sizes):
+    """Test the default sizes and the full run up to 1M rules."""
+    calls = []
+    monkeypatch.setattr(suite, "run", lambda *args: calls.append(args) or [])
+    assert suite.main(args) == 0
+    assert calls[0][0] == sizes
+    assert 1000000 in suite.FULL_SIZES
+
+
+def test_scaling_against_legacy(capsys):
+    """Test the legacy parser agrees with the current one and is reported."""
+    for profile in scaling.PROFILES:
+        text = scaling.make_sheet(50, profile)
+        assert LineParser(text).results == QssParser(text).results
+    scaling.run(start=10, steps=1, repeat=1)
+    assert "speedup" in capsys.readouterr().out
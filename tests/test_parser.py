@@ -0,0 +1,397 @@
+#! /usr/bin/python3
+# -*- coding: utf-8 -*-
+
+##############################################################################
+#  Copyright 2022 alexpdev
+#
+#  Licensed under the Apache License, Version 2.0 (the "License");
+#  you may not use this file except in compliance with the License.
+#  You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+#  Unless required by applicable law or agreed to in writing, software
+#  distributed under the License is distributed on an "AS IS" BASIS,
+#  WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#  See the License for the specific language governing permissions and
+#  limitations under the License.
+##############################################################################
+"""Module for testing the qss tokenizer and parser."""
+
+import io
+import json
+import os
+import random
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+from QStyler.cache import ParseCache, parse_cache
+from QStyler.diff import diff_rules
+from QStyler.incremental import IncrementalParser
+from QStyler.model import VOCABULARY, Stylesheet
+from QStyler.profiler import Profiler
+from QStyler.scope import selector_subject
+from QStyler.tokenizer import COMMENT, DECLARATION, SELECTOR, tokenize
+from QStyler.utils import (ParsingError, QssParser, get_src_dir,
+                           json_to_stylesheet, parse_stylesheet,
+                           recover_stylesheet, write_stylesheet)
+
+
+def test_parser_file_results():
+    """Test the parser output for the sample qss file."""
+    path = os.path.join(os.path.dirname(__file__), "test.qss")
+    content = open(path, "rt", encoding="utf8").read()
+    results = QssParser(content).results
+    assert results["QLineEdit"] == results["QLabel"] == {"font-size": "15pt"}
+    assert results["QPushButton:pressed"]["border-width"] == "3px"
+    assert results["QPushButton:hover"] == {"color": "#080"}
+    assert results["QSpinBox::down-arrow"] == {}
+
+
+def test_parser_minified():
+    """Test multiple rules and declarations on a single line."""
+    sheet = "QLabel{color:red;margin:1px}QPushButton,QToolButton{border:none}"
+    results = QssParser(sheet).results
+    assert results == {
+        "QLabel": {"color": "red", "margin": "1px"},
+        "QPushButton": {"border": "none"},
+        "QToolButton": {"border": "none"},
+    }
+
+
+def test_parser_inline_comments():
+    """Test comments that share a line with selectors and declarations."""
+    sheet = "QLabel /* a */ { color: /* b */ red; } /* c */ QFrame {}"
+    results = QssParser(sheet).results
+    assert results == {"QLabel": {"color": "red"}, "QFrame": {}}
+
+
+def test_tokenizer_offsets():
+    """Test token kinds and offsets."""
+    sheet = "/* x */\nQLabel {\n  color: red;\n}\n"
+    tokens = list(tokenize(sheet))
+    kinds = [token.kind for token in tokens]
+    assert kinds == [COMMENT, SELECTOR, DECLARATION, "end"]
+    selector, declaration = tokens[1], tokens[2]
+    assert sheet[selector.start:selector.end] == "QLabel {"
+    assert sheet[declaration.start:declaration.end] == "color: red;"
+
+
+@pytest.mark.parametrize(
+    "sheet",
+    ["QLabel {\n color: red;\n", "QLabel {}\n/* open", "QLabel { font: 'a; }"],
+)
+def test_parser_unterminated(sheet):
+    """Test unterminated blocks and comments raise in strict mode."""
+    with pytest.raises(ParsingError):
+        QssParser(sheet, strict=True)
+    assert len(QssParser(sheet).errors) == 1
+
+
+def test_parser_unterminated_string():
+    """Test an open string only drops its own declaration."""
+    sheet = (
+        'QLabel { font-family: "Sans;\n  margin: 1px; }\n'
+        "QFrame { border: none; font-family: 'Mono' }\n"
+    )
+    parser = QssParser(sheet)
+    assert parser.results == {
+        "QLabel": {"margin": "1px"},
+        "QFrame": {"border": "none", "font-family": "'Mono'"},
+    }
+    assert [str(d) for d in parser.errors] == [
+        "line 1, column 23: unterminated string"
+    ]
+
+
+def test_parser_recovers_from_errors():
+    """Test valid rules around errors are kept and errors are located."""
+    sheet = (
+        "QLabel { color: red; }\n"
+        "QFrame { margin: 1px;\n"
+        "QPushButton { border: none; }\n"
+        "} QToolButton { padding: 2px; }\n"
+    )
+    parser = QssParser(sheet)
+    assert parser.results["QLabel"] == {"color": "red"}
+    assert parser.results["QFrame"] == {"margin": "1px"}
+    assert parser.results["QPushButton"] == {"border": "none"}
+    assert parser.results["QToolButton"] == {"padding": "2px"}
+    assert [(d.line, d.column) for d in parser.errors] == [(3, 13), (4, 1)]
+    assert str(parser.errors[0]).startswith("line 3, column 13:")
+
+
+@pytest.mark.parametrize(
+    "edit",
+    [
+        (7, 3, "blue"),
+        (0, 0, "QFrame { margin: 0px; }\n"),
+        (19, 1, ""),
+        (26, 0, "/* "),
+        (30, 14, "QLabel, QFrame {"),
+    ],
+)
+def test_incremental_update(edit):
+    """Test incremental updates match a full parse of the edited text."""
+    text = "QLabel { color: red; }\nQPushButton { border: none; }\n"
+    parser = IncrementalParser(text)
+    position, removed, added = edit
+    text = text[:position] + added + text[position + removed:]
+    parser.update(text, position, removed, len(added))
+    expected = QssParser(text)
+    assert parser.results == expected.results
+    assert parser.diagnostics(text) == expected.errors
+    assert parser.valid == (not expected.errors)
+
+
+def test_incremental_edit_sequence():
+    """Test a series of edits keeps the spans and cascade order intact."""
+    rule = "QLabel { color: red; }\nQFrame { margin: 0px; }\n"
+    text = rule * 20
+    parser = IncrementalParser(text)
+    rng = random.Random(7)
+    for _ in range(200):
+        position = rng.randrange(len(text) + 1)
+        removed = rng.randrange(min(4, len(text) - position) + 1)
+        added = rng.choice(["", "x", ";", "}", "QLabel { color: blue; }"])
+        text = text[:position] + added + text[position + removed:]
+        parser.update(text, position, removed, len(added))
+        expected = QssParser(text)
+        assert parser.results == expected.results
+        assert parser.diagnostics(text) == expected.errors
+
+
+@pytest.mark.parametrize("chunk_size", [1, 7, 4096])
+def test_iter_rules_chunks(chunk_size):
+    """Test streamed rules match the parser results for any chunk size."""
+    path = os.path.join(os.path.dirname(__file__), "test.qss")
+    content = open(path, "rt", encoding="utf8").read()
+    streamed = {}
+    for selector, props, span in QssParser.iter_rules(path, chunk_size):
+        streamed[selector] = props
+        assert content[span[0]:span[1]].endswith("}")
+    assert streamed == QssParser(content).results
+    with open(path, "rb") as fd:
+        rules = list(QssParser.iter_rules(fd, chunk_size))
+    assert len(rules) == len(streamed)
+
+
+def test_iter_rules_unterminated():
+    """Test streaming reports the line of an unterminated block."""
+    sheet = io.StringIO("QLabel { color: red; }\n\nQFrame {\n margin: 0;\n")
+    with pytest.raises(ParsingError, match="5"):
+        list(QssParser.iter_rules(sheet, chunk_size=4))
+
+
+def test_grouped_selectors_copy_on_write():
+    """Test grouped selectors are independent and serialize as json."""
+    sheet = "QLabel, QFrame { color: red; }"
+    results = QssParser(sheet).results
+    results["QLabel"]["color"] = "blue"
+    del results["QLabel"]["color"]
+    assert results["QLabel"] == {}
+    assert results["QFrame"] == {"color": "red"}
+    assert json.loads(json.dumps(results)) == {
+        "QLabel": {},
+        "QFrame": {"color": "red"},
+    }
+    expected = {"QLabel": {"color": "red"}, "QFrame": {"color": "red"}}
+    assert json.loads(json.dumps(IncrementalParser(sheet).results)) == expected
+    streamed = {
+        selector: props
+        for selector, props, _ in QssParser.iter_rules(io.StringIO(sheet))
+    }
+    assert json.loads(json.dumps(streamed)) == expected
+
+
+def test_parse_cache_limits():
+    """Test cache hits, misses and eviction by entry count and memory."""
+    cache = ParseCache(maxsize=2)
+    calls = []
+    for text in ["a", "b", "a", "c", "b"]:
+        cache.fetch(text, "kind", lambda: calls.append(1))
+    stats = cache.stats()
+    assert (stats.hits, stats.misses, stats.entries) == (1, 4, 2)
+    cache.resize(max_memory=0)
+    assert cache.stats().entries == 0 and cache.stats().memory == 0
+
+
+def test_parse_stylesheet_cached():
+    """Test repeated parses of the same text are served from the cache."""
+    hits = parse_cache.stats().hits
+    first = parse_stylesheet("QLabel { color: red; }\n")
+    second = parse_stylesheet("QLabel { color: red; }\n")
+    assert first is second
+    assert parse_cache.stats().hits == hits + 1
+    assert parse_stylesheet("QLabel { color: red;").errors
+    padded = parse_stylesheet("\n\n\n\nQLabel { color: red;")
+    assert padded is not parse_stylesheet("QLabel { color: red;")
+    assert "line 5" in str(padded.errors[0])
+
+
+def test_stylesheet_model_round_trip():
+    """Test the compact model converts losslessly to the theme format."""
+    path = get_src_dir() / "themes" / "Dracula.json"
+    theme = json.load(open(path, encoding="utf8"))
+    sheet = Stylesheet.load(path)
+    assert sheet.to_dict() == theme
+    assert list(sheet.to_dict()) == list(theme)
+    assert json_to_stylesheet(sheet.to_dict()) == json_to_stylesheet(theme)
+
+
+def test_serializer_modes(tmp_path):
+    """Test pretty, minified and streamed serialization agree."""
+    theme = {"QLabel": {"color": "red", "margin": "1px 2px"}, "QMenu": {}}
+    pretty = json_to_stylesheet(theme)
+    assert pretty == "QLabel {\n    color: red;\n    margin: 1px 2px;\n}\n"
+    minified = json_to_stylesheet(theme, minified=True)
+    assert minified == "QLabel{color:red;margin:1px 2px;}"
+    assert QssParser(minified).results == QssParser(pretty).results
+    path = tmp_path / "theme.qss"
+    with open(path, "wt", encoding="utf8") as fd:
+        assert write_stylesheet(theme, fd.write) == 1
+    assert path.read_text(encoding="utf8") == pretty
+
+
+def test_recover_stylesheet():
+    """Test recovered rules keep their order, repeats and urls."""
+    sheet = (
+        "QLabel { color: red; }\nQFrame { image: url(:/a.png); }\n"
+        "QLabel { background: blue; }\nQPushButton { border: none;\n"
+    )
+    assert QssParser(sheet).results["QFrame"] == {}
+    assert QssParser(sheet, urls=True).rules() == [
+        ("QLabel", {"color": "red"}),
+        ("QFrame", {"image": "url(:/a.png)"}),
+        ("QLabel", {"background": "blue"}),
+        ("QPushButton", {"border": "none"}),
+    ]
+    assert recover_stylesheet(sheet) == (
+        "QLabel{color:red;}QFrame{image:url(:/a.png);}"
+        "QLabel{background:blue;}QPushButton{border:none;}"
+    )
+
+
+def test_stylesheet_model_shares_declarations():
+    """Test equal declarations and names are stored only once."""
+    results = QssParser("QLabel { color: red; }\nQFrame{color:red}").results
+    first, second = Stylesheet.from_dict(results)
+    assert first.declarations[0] is second.declarations[0]
+    assert first.declarations[0].name is VOCABULARY["color"]
+
+
+def test_parse_file_memory_mapped(tmp_path):
+    """Test parsing a file from a memory map matches parsing its text."""
+    path = os.path.join(os.path.dirname(__file__), "test.qss")
+    content = open(path, "rt", encoding="utf8").read()
+    parser = QssParser(strict=True)
+    assert parser.parse_file(path) == QssParser(content).results
+    assert parser.parse(path) == parser.results
+    empty = tmp_path / "empty.qss"
+    empty.write_text("", encoding="utf8")
+    assert parser.parse_file(empty) == {}
+    broken = tmp_path / "broken.qss"
+    broken.write_text("QLabel { color: é;\n\n", encoding="utf8")
+    with pytest.raises(ParsingError, match="3"):
+        parser.parse_file(broken)
+
+
+def test_parse_string_skips_filesystem(monkeypatch):
+    """Test string input is never looked up on the filesystem."""
+
+    def fail(*_):
+        raise AssertionError("filesystem accessed")  # pragma: nocover
+
+    monkeypatch.setattr(os.path, "exists", fail)
+    monkeypatch.setattr(os.path, "isfile", fail)
+    assert QssParser("QLabel { color: red; }").results
+    assert QssParser().parse("QLabel {\n color: red; }")
+
+
+def test_parser_thread_safe():
+    """Test parsers running on several threads give identical results."""
+    sheets = [f"QLabel#n{i} {{ margin: {i}px; }}\n" * 200 for i in range(8)]
+    expected = [QssParser(sheet).results for sheet in sheets]
+    parse_cache.clear()
+    with ThreadPoolExecutor(4) as pool:
+        results = list(pool.map(lambda s: QssParser(s).results, sheets * 4))
+        indexes = list(pool.map(IncrementalParser.index, sheets * 4))
+    assert results == expected * 4
+    assert all(index[0] for index in indexes)
+
+
+def test_diff_rules():
+    """Test the rule diff ignores formatting and reports selectors."""
+    old = QssParser("QLabel, QFrame { color: red; }\nQMenu {}").results
+    same = QssParser("/* x */ QLabel {color:red}\n\nQFrame{color: red}\n"
+                     "QMenu { }").results
+    assert diff_rules(old, same).empty
+    new = QssParser("QLabel { color: blue; } QFrame { color: red; }"
+                    "QSlider {}").results
+    diff = diff_rules(old, new)
+    assert diff == (("QSlider",), ("QMenu",), ("QLabel",), False)
+    assert diff.selectors == ("QSlider", "QMenu", "QLabel")
+    swapped = QssParser("QMenu {} QLabel, QFrame { color: red; }").results
+    assert diff_rules(old, swapped).reordered
+
+
+@pytest.mark.parametrize(
+    "sheet, block",
+    [
+        ("QPushButton{color:red}\nQAbstractButton{color:blue}\n",
+         "QPushButton{color:red}\n"),
+        ("QLabel{color:red}\nQFrame{color:blue}\nQLabel{color:green}\n",
+         "QFrame{color:blue}\n"),
+    ],
+)
+def test_diff_rules_incremental_reorder(sheet, block):
+    """Test moving a block with incremental edits is reported."""
+    parser = IncrementalParser(sheet)
+    old, order = dict(parser.cascade), parser.sequence()
+    start = sheet.index(block)
+    text = sheet[:start] + sheet[start + len(block):]
+    parser.update(text, start, len(block), 0)
+    parser.update(text + block, len(text), 0, len(block))
+    assert parser.cascade == old
+    diff = diff_rules(old, parser.cascade, (order, parser.sequence()))
+    assert diff.reordered and not diff.selectors
+    assert diff_rules(old, parser.cascade, (order, order)).empty
+
+
+@pytest.mark.parametrize(
+    "selector, subject",
+    [
+        ("QScrollBar::handle:hover", ("QScrollBar", None)),
+        ("QFrame > QPushButton#ok:pressed", ("QPushButton", "ok")),
+        ("#name", (None, "name")),
+        ("*", (None, None)),
+        ('QLineEdit[readOnly="true"]', ("QLineEdit", None)),
+    ],
+)
+def test_selector_subject(selector, subject):
+    """Test the class and object name targeted by a selector."""
+    assert selector_subject(selector) == subject
+
+
+def test_profiler_percentiles():
+    """Test recorded durations, percentiles and disabled hooks."""
+    profiler = Profiler()
+
+    @profiler.timed("work")
+    def work(value):
+        return value * 2
+
+    assert work(2) == 4
+    assert profiler.summary() == {}
+    profiler.enabled = True
+    for i in range(100):
+        profiler.record("op", 0.0, i / 1000)
+    with profiler.span("block"):
+        work(1)
+    values = profiler.percentiles("op")
+    assert values == {"p50": 0.05, "p95": 0.095, "p99": 0.099}
+    assert profiler.summary()["op"]["count"] == 100
+    assert profiler.describe("op") == "op 50.0/95.0/99.0 ms"
+    names = [e["name"] for e in profiler.trace_events()["traceEvents"]]
+    assert names[-2:] == ["work", "block"]
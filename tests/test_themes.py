@@ -0,0 +1,274 @@
+#! /usr/bin/python3
+# -*- coding: utf-8 -*-
+
+##############################################################################
+#  Copyright 2022 alexpdev
+#
+#  Licensed under the Apache License, Version 2.0 (the "License");
+#  you may not use this file except in compliance with the License.
+#  You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+#  Unless required by applicable law or agreed to in writing, software
+#  distributed under the License is distributed on an "AS IS" BASIS,
+#  WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#  See the License for the specific language governing permissions and
+#  limitations under the License.
+##############################################################################
+"""Tests for theme storage."""
+
+import json
+import os
+import stat
+
+import pytest
+
+from QStyler.bundle import (BundleError, ThemeBundle, open_bundle, pack,
+                            unpack)
+from QStyler.catalog import ThemeCatalog
+from QStyler.optimizer import (as_theme, optimize, optimize_directory,
+                               optimize_stylesheet)
+from QStyler.persistence import UMASK, write_atomic
+from QStyler.store import ThemeStore
+from QStyler.themecache import ThemeCache
+from QStyler.utils import json_to_stylesheet
+
+
+def write_theme(directory, name, theme):
+    """Write a theme json file and return its path."""
+    path = directory / (name + ".json")
+    with open(path, "wt", encoding="utf8") as fd:
+        json.dump(theme, fd)
+    return path
+
+
+@pytest.fixture
+def themes(tmp_path):
+    """Return a directory holding two themes."""
+    write_theme(tmp_path, "light", {"QLabel": {"color": "black"}})
+    write_theme(tmp_path, "dark", {"QLabel": {"color": "white"}, "QMenu": {}})
+    return tmp_path
+
+
+def test_catalog_index(themes):
+    """Test the catalog indexes every theme and persists the index."""
+    catalog = ThemeCatalog(themes)
+    assert sorted(catalog.names()) == ["dark", "light"]
+    entry = catalog.get("dark")
+    assert entry.rules == 2
+    assert entry.size == os.path.getsize(themes / "dark.json")
+    assert catalog.load("light") == {"QLabel": {"color": "black"}}
+    assert catalog.get("missing") is None
+    reopened = ThemeCatalog(themes)
+    assert reopened.entries == catalog.entries
+    assert not reopened.refresh()
+    assert catalog.index_path.is_file()
+    assert themes not in catalog.index_path.parents
+
+
+def test_catalog_updates(themes):
+    """Test added, modified, renamed and removed themes."""
+    catalog = ThemeCatalog(themes)
+    digest = catalog.get("light").digest
+    path = write_theme(themes, "light", {"QLabel": {"color": "gray"}})
+    os.utime(path, ns=(1, 1))
+    entry = catalog.get("light")
+    assert entry.digest != digest and entry.mtime == 1
+    write_theme(themes, "blue", {})
+    assert catalog.refresh(force=True)
+    assert "blue" in catalog.names()
+    os.rename(themes / "blue.json", themes / "navy.json")
+    catalog.rename("blue", "navy")
+    assert "navy" in catalog.names() and "blue" not in catalog.names()
+    os.remove(themes / "dark.json")
+    assert catalog.get("dark") is None
+    assert "dark" not in ThemeCatalog(themes).names()
+
+
+def test_catalog_unreadable_files(themes, monkeypatch):
+    """Test files that can not be decoded or read do not stop indexing."""
+    with open(themes / "bad.json", "wb") as fd:
+        fd.write(b"\xff\xfe{")
+    (themes / "folder.json").mkdir()
+    index = ThemeCatalog._index
+
+    def unreadable(name, path):
+        return None if name == "light" else index(name, path)
+
+    monkeypatch.setattr(ThemeCatalog, "_index", staticmethod(unreadable))
+    catalog = ThemeCatalog(themes)
+    assert sorted(catalog.names()) == ["bad", "dark"]
+    assert catalog.get("bad").rules == 0
+    assert catalog.update("light") is None
+    assert catalog.update("missing") is None
+    assert sorted(catalog.names()) == ["bad", "dark"]
+
+
+def test_theme_cache(themes):
+    """Test rendered themes are cached until their file changes."""
+    cache = ThemeCache(ThemeCatalog(themes), maxsize=2)
+    qss = cache.stylesheet("light")
+    assert qss == json_to_stylesheet({"QLabel": {"color": "black"}})
+    assert cache.stylesheet("light") is qss
+    assert (cache.hits, cache.misses) == (1, 1)
+    assert cache.model("dark").to_dict() == cache.theme("dark")
+    path = write_theme(themes, "light", {"QLabel": {"color": "gray"}})
+    os.utime(path, ns=(1, 1))
+    assert "gray" in cache.stylesheet("light")
+    assert cache.stylesheet("missing") == ""
+
+
+def test_theme_cache_prefetch(themes):
+    """Test prefetched themes are served without reading the file."""
+    cache = ThemeCache(ThemeCatalog(themes))
+    cache.prefetch(["dark", "light", "missing"])
+    cache.wait()
+    assert cache.theme("dark")["QLabel"] == {"color": "white"}
+    assert cache.theme("light")
+    assert (cache.hits, cache.misses) == (2, 0)
+
+
+@pytest.mark.parametrize("compress", [False, True])
+def test_bundle_round_trip(themes, tmp_path_factory, compress):
+    """Test packing, memory mapped loading and unpacking themes."""
+    path = tmp_path_factory.mktemp("bundle") / "themes.qstb"
+    assert pack(themes, path, compress) == 2
+    with ThemeBundle(path) as bundle:
+        assert bundle.names() == ["dark", "light"]
+        assert bundle.load("light") == {"QLabel": {"color": "black"}}
+        assert "dark" in bundle and "blue" not in bundle
+    output = tmp_path_factory.mktemp("unpacked")
+    assert unpack(path, output) == 2
+    with open(output / "dark.json", "rt", encoding="utf8") as fd:
+        assert json.load(fd) == {"QLabel": {"color": "white"}, "QMenu": {}}
+
+
+def test_bundle_invalid(tmp_path):
+    """Test files that are not bundles are rejected."""
+    path = tmp_path / "bad.qstb"
+    path.write_bytes(b"not a bundle at all")
+    with pytest.raises(BundleError):
+        ThemeBundle(path)
+    assert open_bundle(path) is None
+    assert open_bundle(tmp_path / "missing.qstb") is None
+
+
+def test_theme_cache_bundle_fallback(themes, tmp_path_factory):
+    """Test themes missing from the directory are read from a bundle."""
+    path = tmp_path_factory.mktemp("bundle") / "themes.qstb"
+    pack(themes, path)
+    os.remove(themes / "dark.json")
+    with ThemeBundle(path) as bundle:
+        cache = ThemeCache(ThemeCatalog(themes), bundle=bundle)
+        assert "white" in cache.stylesheet("dark")
+        assert cache.stylesheet("dark") is cache.stylesheet("dark")
+        assert cache.stylesheet("missing") == ""
+
+
+def test_write_atomic(tmp_path):
+    """Test atomic writes replace the file and leave no temporary files."""
+    path = tmp_path / "theme.json"
+    write_atomic(path, {"QLabel": {"color": "red"}})
+    write_atomic(path, {"QLabel": {"color": "blue"}})
+    with open(path, "rt", encoding="utf8") as fd:
+        assert json.load(fd) == {"QLabel": {"color": "blue"}}
+    with pytest.raises(TypeError):
+        write_atomic(path, {"QLabel": object()})
+    assert os.listdir(tmp_path) == ["theme.json"]
+
+
+@pytest.mark.skipif(os.name == "nt", reason="posix permissions")
+def test_write_atomic_permissions(tmp_path):
+    """Test new files follow the umask and rewrites keep their mode."""
+    path = tmp_path / "theme.json"
+    write_atomic(path, {})
+    assert stat.S_IMODE(os.stat(path).st_mode) == 0o666 & ~UMASK
+    os.chmod(path, 0o644)
+    write_atomic(path, {"QLabel": {"color": "red"}})
+    assert stat.S_IMODE(os.stat(path).st_mode) == 0o644
+
+
+def test_theme_store(themes, tmp_path_factory):
+    """Test importing, querying and exporting themes with the store."""
+    with ThemeStore() as store:
+        assert store.import_directory(themes) == 2
+        assert store.import_directory(themes) == 0
+        store.add_qss("tabs", "QTabBar::tab:selected { color: #BD93F9; }")
+        assert store.names() == ["dark", "light", "tabs"]
+        assert store.theme("dark") == {"QLabel": {"color": "white"},
+                                       "QMenu": {}}
+        assert store.themes_with_selector("QLabel") == ["dark", "light"]
+        assert store.themes_with_property("color", "black") == ["light"]
+        assert store.search("#bd93f9") == ["tabs"]
+        assert store.search("QTabBar::tab:selected") == ["tabs"]
+        store.remove_theme("tabs")
+        assert store.search("#bd93f9") == []
+        target = tmp_path_factory.mktemp("export")
+        assert store.export_directory(target) == 2
+        assert ThemeCatalog(target).load("light") == {
+            "QLabel": {"color": "black"}
+        }
+
+
+def test_optimize_preserves_cascade():
+    """Test blocks are regrouped only where the cascade allows it."""
+    theme = {
+        "QPushButton": {"color": "red"},
+        "QAbstractButton": {"color": "green"},
+        "QLabel": {"color": "blue"},
+        "QToolButton, QLabel#title": {"color": "red"},
+        "QMenu": {},
+        "QFrame": {"border": "none"},
+        "QLabel ,QPushButton:hover": {"border-color": "red", "margin": "0"},
+    }
+    assert optimize(theme) == [
+        ("QPushButton", {"color": "red"}),
+        ("QAbstractButton", {"color": "green"}),
+        ("QLabel", {"color": "blue"}),
+        ("QToolButton, QLabel#title", {"color": "red"}),
+        ("QFrame", {"border": "none"}),
+        ("QLabel, QPushButton:hover", {"border-color": "red", "margin": "0"}),
+    ]
+    assert optimize({"QLabel": {"color": "red"}, "QFrame": {"margin": "0"},
+                     "QCheckBox": {"color": "red"}}) == [
+        ("QLabel, QCheckBox", {"color": "red"}), ("QFrame", {"margin": "0"})
+    ]
+    rules = optimize_stylesheet(
+        "QPushButton { color: red; }\n"
+        "QWidget { color: blue; background: green; }\n"
+        "QPushButton { background: white; }\n"
+    )
+    assert rules == [
+        ("QPushButton", {"color": "red"}),
+        ("QWidget", {"color": "blue", "background": "green"}),
+        ("QPushButton", {"background": "white"}),
+    ]
+    assert as_theme(rules) is None
+    rules = optimize_stylesheet(
+        "QPushButton { color: black; }\n"
+        "QAbstractButton { border-top-color: blue; }\n"
+        "QPushButton { border-color: red; }\n"
+    )
+    assert rules == [
+        ("QPushButton", {"color": "black"}),
+        ("QAbstractButton", {"border-top-color": "blue"}),
+        ("QPushButton", {"border-color": "red"}),
+    ]
+
+
+def test_optimize_directory(themes, tmp_path_factory):
+    """Test a directory of themes is optimized into another one."""
+    write_theme(themes, "group", {"QLabel": {"margin": "0"}, "QMenu": {},
+                                  "QCheckBox": {"margin": "0"}})
+    kept = {"QLabel, QFrame": {"color": "red"}, "QWidget": {"color": "blue"},
+            "QFrame": {"margin": "0"}, "QLabel": {"margin": "0"}}
+    write_theme(themes, "kept", kept)
+    target = tmp_path_factory.mktemp("optimized")
+    report = {item.name: item for item in optimize_directory(themes, target)}
+    assert report["group"][1:] == (2, 2, 1, 1)
+    assert report["light"][1:] == (1, 1, 1, 1)
+    assert report["kept"][1:] == (4, 4, 4, 4)
+    catalog = ThemeCatalog(target)
+    assert catalog.load("group") == {"QLabel, QCheckBox": {"margin": "0"}}
+    assert catalog.load("kept") == kept
@@ -19,18 +19,32 @@
 """Module for testing functions and methods."""
 
 import atexit
+import importlib.util
+import json
 import os
 import re
 import sys
 import time
 
 import pytest
+from PySide6.QtCore import QFile, QResource
+from PySide6.QtGui import QImage
 from PySide6.QtWidgets import QApplication, QMainWindow
 
 from QStyler import __main__, version
+from QStyler.bundle import ThemeBundle, pack
+from QStyler.catalog import ThemeCatalog
 from QStyler.dialog import AboutQStyler, NewDialog, RenameDialog
-from QStyler.utils import QssParser
-from QStyler.window import Application
+from QStyler.lazy import LazyTab
+from QStyler.persistence import ThemeWriter, write_atomic
+from QStyler.profiler import profiler
+from QStyler.resources import export_resource, find_rcc
+from QStyler.scheduler import LiveUpdateScheduler
+from QStyler.styler import ToolBar
+from QStyler.thumbnails import ThumbnailRenderer
+from QStyler.utils import QssParser, get_src_dir, json_to_stylesheet
+from QStyler.watcher import ThemeWatcher
+from QStyler.window import Application, MainWindow
 
 
 @pytest.fixture(scope="package")
@@ -335,3 +349,469 @@ def teardown():
         test_json = os.path.join(theme_dir, "test.json")
         if os.path.exists(test_json):
             os.remove(test_json)  # pragma: nocover
+
+
+def test_styler_incremental_results(app, wind):
+    """Test the styler keeps parse results in sync with editor edits."""
+    styler = wind.styler
+    styler.toolbar.live_action.setChecked(False)
+    styler.editor.setPlainText("QLabel { color: red; }\nQFrame {}\n")
+    styler.worker.wait()
+    cursor = styler.editor.textCursor()
+    cursor.setPosition(9)
+    styler.editor.setTextCursor(cursor)
+    styler.editor.insertPlainText("margin: 2px; ")
+    processtime(app)
+    text = styler.editor.toPlainText()
+    assert styler.sheet.results == QssParser(text).results
+    assert styler.sheet.results["QLabel"]["margin"] == "2px"
+    styler.editor.clear()
+    styler.toolbar.live_action.setChecked(True)
+
+
+def test_live_update_scheduler_coalesces(app):
+    """Test a burst of requests results in a single call."""
+    calls = []
+    scheduler = LiveUpdateScheduler(lambda: calls.append(1), maximum=50)
+    for _ in range(20):
+        scheduler.schedule()
+    assert not calls
+    processtime(app, 0.1)
+    assert calls == [1]
+    scheduler.flush()
+    assert calls == [1]
+    scheduler.cost = 1.0
+    assert scheduler.delay() == 50
+    scheduler.cost = 0.0
+    assert scheduler.delay() == 0
+    scheduler.schedule()
+    scheduler.cancel()
+    processtime(app, 0.05)
+    assert calls == [1]
+
+
+def test_styler_live_update_debounced(app, wind):
+    """Test typing applies the final editor state once the burst ends."""
+    styler = wind.styler
+    styler.toolbar.live_action.setChecked(True)
+    styler.editor.clear()
+    styler.worker.wait()
+    processtime(app, 0.05)
+    applied = []
+
+    def record(cost):
+        applied.append(cost)
+
+    styler.scheduler.applied.connect(record)
+    for char in "QLabel { color: #123456; }":
+        styler.editor.insertPlainText(char)
+    processtime(app, 0.2)
+    styler.scheduler.applied.disconnect(record)
+    assert 1 <= len(applied) < 5
+    assert "#123456" in app.styleSheet()
+    styler.editor.clear()
+    styler.worker.wait()
+
+
+def test_parse_worker_drops_stale_results(app, wind):
+    """Test only the newest submission is delivered."""
+    styler = wind.styler
+    results = []
+
+    def record(text, index):
+        results.append(text)
+
+    styler.worker.finished.connect(record)
+    for i in range(5):
+        styler.worker.submit(f"QLabel {{ margin: {i}px; }}")
+    styler.worker.wait()
+    styler.worker.finished.disconnect(record)
+    assert results == ["QLabel { margin: 4px; }"]
+    assert styler.sheet.results == {"QLabel": {"margin": "4px"}}
+    assert not styler.worker.busy
+    styler.editor.clear()
+    styler.worker.wait()
+
+
+def test_styler_skips_unchanged_apply(app, wind):
+    """Test formatting only edits do not apply the style sheet again."""
+    styler = wind.styler
+    styler.toolbar.live_action.setChecked(False)
+    styler.editor.setPlainText("QLabel { color: #654321; }")
+    styler.worker.wait()
+    changes = []
+
+    def record(diff):
+        changes.append(diff)
+
+    styler.rulesChanged.connect(record)
+    styler.parse_changes()
+    styler.editor.insertPlainText("\n\n/* note */\n")
+    styler.parse_changes()
+    styler.rulesChanged.disconnect(record)
+    assert len(changes) == 1
+    assert "#654321" in app.styleSheet()
+    styler.editor.clear()
+    styler.worker.wait()
+    styler.toolbar.live_action.setChecked(True)
+
+
+@pytest.mark.parametrize(
+    "sheet, old, new",
+    [
+        ("QLabel { image: url(:/a.png); }", "a.png", "b.png"),
+        ("QLabel { color: red; } QLabel { margin: 1px; }", "red", "green"),
+    ],
+)
+def test_styler_applies_lossless_edits(app, wind, sheet, old, new):
+    """Test url edits and edits to repeated selectors are applied."""
+    styler = wind.styler
+    styler.toolbar.live_action.setChecked(False)
+    styler.editor.setPlainText(sheet)
+    styler.worker.wait()
+    styler.parse_changes()
+    cursor = styler.editor.textCursor()
+    start = sheet.index(old)
+    cursor.setPosition(start)
+    cursor.setPosition(start + len(old), cursor.MoveMode.KeepAnchor)
+    cursor.insertText(new)
+    styler.parse_changes()
+    assert app.styleSheet() == sheet.replace(old, new)
+    styler.editor.clear()
+    styler.worker.wait()
+    styler.parse_changes()
+    styler.toolbar.live_action.setChecked(True)
+
+
+def test_styler_applies_moved_rules(app, wind):
+    """Test moving a block that changes the cascade is applied."""
+    styler = wind.styler
+    styler.toolbar.live_action.setChecked(False)
+    block = "QPushButton{color:red}\n"
+    styler.editor.setPlainText(block + "QAbstractButton{color:blue}\n")
+    styler.worker.wait()
+    styler.parse_changes()
+    cursor = styler.editor.textCursor()
+    cursor.setPosition(0)
+    cursor.setPosition(len(block), cursor.MoveMode.KeepAnchor)
+    cursor.removeSelectedText()
+    cursor.movePosition(cursor.MoveOperation.End)
+    cursor.insertText(block)
+    styler.parse_changes()
+    assert app.styleSheet().index("QAbstractButton") == 0
+    styler.editor.clear()
+    styler.worker.wait()
+    styler.parse_changes()
+    styler.toolbar.live_action.setChecked(True)
+
+
+def test_styler_applies_recovered_rules(app, wind):
+    """Test a sheet with errors applies every recovered declaration."""
+    styler = wind.styler
+    styler.toolbar.live_action.setChecked(False)
+    styler.editor.setPlainText(
+        "QLabel { color: #102030; }\nQFrame { image: url(:/a.png); }\n"
+        "QLabel { background: #405060; }\nQPushButton { border: none;\n"
+    )
+    styler.worker.wait()
+    styler.parse_changes()
+    sheet = app.styleSheet()
+    assert "url(:/a.png)" in sheet
+    assert sheet.index("#102030") < sheet.index("#405060")
+    styler.editor.clear()
+    styler.worker.wait()
+    styler.parse_changes()
+    styler.toolbar.live_action.setChecked(True)
+
+
+def test_styler_scoped_apply(app, wind):
+    """Test scoped mode styles only the panes holding matched widgets."""
+    styler = wind.styler
+    toolbar = styler.toolbar
+    toolbar.live_action.setChecked(False)
+    app.setStyleSheet("")
+    toolbar.scope_action.setChecked(True)
+    styler.editor.setPlainText("QLabel { color: #abcdef; }")
+    styler.worker.wait()
+    styler.parse_changes()
+    assert app.styleSheet() == ""
+    assert all("#abcdef" in pane.styleSheet() for pane in styler.scope.panes)
+    styler.editor.setPlainText(
+        "QLabel { color: #abcdef; }\nQKeySequenceEdit { color: #fedcba; }"
+    )
+    styler.worker.wait()
+    styler.parse_changes()
+    assert "#fedcba" in wind.widgets.styleSheet()
+    assert "#fedcba" not in wind.collections.styleSheet()
+    toolbar.scope_action.setChecked(False)
+    assert all(not pane.styleSheet() for pane in styler.scope.panes)
+    styler.editor.clear()
+    styler.worker.wait()
+    toolbar.live_action.setChecked(True)
+
+
+def test_styler_optimize_sheet(app, wind):
+    """Test the optimize action regroups the rules in the editor."""
+    styler = wind.styler
+    styler.toolbar.live_action.setChecked(False)
+    sheet = (
+        "QLabel, QCheckBox { color: red; margin: 0; }\n"
+        "QLabel { margin: 1px; }\nQMenu { }\n"
+        "QCheckBox::indicator { image: url(:/on.png); }"
+    )
+    styler.editor.setPlainText(sheet)
+    styler.toolbar.optimize_action.trigger()
+    assert QssParser(styler.editor.toPlainText(), urls=True).results == {
+        "QLabel": {"color": "red", "margin": "1px"},
+        "QCheckBox": {"color": "red", "margin": "0"},
+        "QCheckBox::indicator": {"image": "url(:/on.png)"},
+    }
+    message = wind.statusBar().currentMessage()
+    assert message.startswith(f"Optimized {len(sheet)} characters to")
+    styler.editor.undo()
+    assert styler.editor.toPlainText() == sheet
+    styler.editor.setPlainText("QLabel { color: red; }\nQMenu { margin: 0;")
+    styler.toolbar.optimize_action.trigger()
+    assert "QMenu { margin: 0;" in styler.editor.toPlainText()
+    assert "fix the error at line 2" in wind.statusBar().currentMessage()
+    styler.editor.clear()
+    styler.worker.wait()
+    styler.toolbar.live_action.setChecked(True)
+
+
+def test_latency_hud(app, wind, tmp_path):
+    """Test the latency display and trace export."""
+    wind.menubar.fileMenu.latencyAction.setChecked(True)
+    profiler.reset()
+    wind.styler.set_current_theme("OSX")
+    wind.styler.worker.wait()
+    wind.update_latency()
+    assert "theme.load" in wind.hud.text()
+    assert "theme.load -" not in wind.hud.text()
+    path = tmp_path / "trace.json"
+    profiler.export_trace(path)
+    with open(path, "rt", encoding="utf8") as fd:
+        events = json.load(fd)["traceEvents"]
+    assert {"parse.index", "theme.load"} <= {e["name"] for e in events}
+    wind.menubar.fileMenu.latencyAction.setChecked(False)
+    assert not profiler.enabled
+    wind.styler.editor.clear()
+    wind.styler.worker.wait()
+
+
+def test_theme_writer_coalesces(app, tmp_path):
+    """Test repeated saves are coalesced and reported in order."""
+    writer = ThemeWriter()
+    saved, failed = [], []
+
+    def on_saved(name, path):
+        saved.append(name)
+
+    def on_failed(path, error):
+        failed.append(path)
+
+    writer.saved.connect(on_saved)
+    writer.failed.connect(on_failed)
+    writer.pool.start(lambda: time.sleep(0.05))
+    for i in range(10):
+        writer.save("a", tmp_path / "a.json", {"QLabel": {"margin": f"{i}px"}})
+    writer.save("b", tmp_path / "b.json", {})
+    writer.save("c", tmp_path / "missing" / "c.json", {})
+    writer.flush()
+    assert saved == ["a", "b"]
+    assert len(failed) == 1
+    with open(tmp_path / "a.json", "rt", encoding="utf8") as fd:
+        assert json.load(fd) == {"QLabel": {"margin": "9px"}}
+
+
+def test_theme_watcher_hot_reload(app, tmp_path):
+    """Test themes changed on disk are picked up incrementally."""
+    for name, color in [("one", "red"), ("two", "blue")]:
+        with open(tmp_path / f"{name}.json", "wt", encoding="utf8") as fd:
+            json.dump({"QLabel": {"color": color}}, fd)
+    catalog = ThemeCatalog(tmp_path, tmp_path / "index")
+    watcher = ThemeWatcher(catalog, delay=10)
+    watcher.watch_theme("one")
+    events = []
+
+    def record(added, removed, changed):
+        events.append((added, removed, changed))
+
+    watcher.themesChanged.connect(record)
+    write_atomic(tmp_path / "three.json", {})
+    os.remove(tmp_path / "two.json")
+    write_atomic(tmp_path / "one.json", {"QLabel": {"color": "green"}})
+    start = time.time()
+    while not events and time.time() - start < 5:
+        app.processEvents()
+    assert events == [(["three"], ["two"], ["one"])]
+    assert sorted(catalog.names()) == ["one", "three"]
+    assert catalog.load("one") == {"QLabel": {"color": "green"}}
+    assert watcher.process() == ([], [], [])
+
+
+def test_theme_watcher_skips_unreadable(app, tmp_path, monkeypatch):
+    """Test directories and unreadable files do not stop the watcher."""
+    write_atomic(tmp_path / "one.json", {"QLabel": {"color": "red"}})
+    catalog = ThemeCatalog(tmp_path, tmp_path / "index")
+    watcher = ThemeWatcher(catalog, delay=10)
+    watcher.watch_theme("one")
+    (tmp_path / "folder.json").mkdir()
+    write_atomic(tmp_path / "two.json", {})
+    index = ThemeCatalog._index
+
+    def unreadable(name, path):
+        return None if name == "two" else index(name, path)
+
+    monkeypatch.setattr(ThemeCatalog, "_index", staticmethod(unreadable))
+    assert watcher.process() == ([], [], [])
+    write_atomic(tmp_path / "one.json", {"QLabel": {"color": "blue"}})
+    os.utime(tmp_path / "one.json", ns=(1, 1))
+    monkeypatch.setattr(
+        ThemeCatalog, "_index", staticmethod(lambda name, path: None)
+    )
+    assert watcher.process() == ([], ["one"], [])
+    assert catalog.names() == []
+
+
+def test_toolbar_bundled_themes(app, tmp_path, monkeypatch):
+    """Test bundled themes without a themes directory or read only."""
+    packed = tmp_path / "packed"
+    packed.mkdir()
+    write_atomic(packed / "light.json", {"QLabel": {"color": "black"}})
+    pack(packed, tmp_path / "themes.qstb")
+    monkeypatch.setattr(
+        "QStyler.styler.open_bundle",
+        lambda: ThemeBundle(tmp_path / "themes.qstb"),
+    )
+    monkeypatch.setattr(ToolBar, "themes_dir", tmp_path / "missing")
+    toolbar = ToolBar()
+    processtime(app)
+    assert toolbar.watcher is None and toolbar.catalog.names() == []
+    toolbar.themes_combo.setCurrentText("light")
+    assert toolbar.themes_combo.currentText() == "light"
+    assert not toolbar.delete_action.isEnabled()
+    toolbar.delete_theme()
+    toolbar.set_theme_name("dark", "light")
+    assert toolbar.themes_combo.findText("light") > 0
+    toolbar.bundle.close()
+    write_atomic(packed / "mine.json", {})
+    monkeypatch.setattr(ToolBar, "themes_dir", packed)
+    toolbar = ToolBar()
+    assert toolbar.catalog.names() == []
+    processtime(app)
+    assert sorted(toolbar.catalog.names()) == ["light", "mine"]
+    toolbar.themes_combo.setCurrentText("mine")
+    assert toolbar.delete_action.isEnabled()
+    toolbar.themes_combo.setCurrentText("light")
+    assert not toolbar.rename_action.isEnabled()
+    toolbar.bundle.close()
+
+
+def test_thumbnail_renderer(app, tmp_path):
+    """Test thumbnails are rendered offscreen once per theme contents."""
+    themes = tmp_path / "themes"
+    themes.mkdir()
+    write_atomic(themes / "red.json", {"QWidget": {"background": "red"}})
+    catalog = ThemeCatalog(themes, tmp_path / "index")
+    renderer = ThumbnailRenderer(catalog, directory=tmp_path / "png",
+                                 workers=1)
+    rendered = []
+
+    def record(name, path):
+        rendered.append((name, path))
+
+    renderer.rendered.connect(record)
+    assert renderer.thumbnail("red") is None
+    renderer.request(["red", "missing"])
+    renderer.wait()
+    path = renderer.thumbnail("red")
+    assert rendered == [("red", path)]
+    image = QImage(path)
+    assert image.width() == renderer.size.width()
+    color = image.pixelColor(image.width() // 2, 2)
+    assert color.red() > 200 and color.green() < 50
+    renderer.request(["red"])
+    assert rendered[-1] == ("red", path)
+    assert renderer.executor is not None
+    renderer.shutdown()
+    for name in ["blue", "green", "navy"]:
+        write_atomic(themes / f"{name}.json", {"QWidget": {"color": name}})
+        catalog.update(name)
+    renderer.request(["blue", "green", "navy"])
+    renderer.shutdown()
+    processtime(app)
+    assert renderer.executor is None and not renderer.pending
+
+
+def test_toolbar_thumbnail_rows(app, monkeypatch):
+    """Test only the popup rows get thumbnails and the combo stays small."""
+    toolbar = ToolBar()
+    combo = toolbar.themes_combo
+    for i in range(60):
+        combo.addItem(f"extra{i}")
+    requested = []
+    monkeypatch.setattr(toolbar.thumbnails, "request", requested.extend)
+    assert combo.iconSize().height() <= 16
+    assert combo.view().iconSize() == toolbar.thumbnails.size
+    assert combo.sizeHint().height() < toolbar.thumbnails.size.height()
+    combo.show()
+    combo.showPopup()
+    processtime(app)
+    assert requested and len(requested) < combo.count() - 1
+    shown = len(requested)
+    combo.view().verticalScrollBar().setValue(combo.count())
+    assert requested[-1] == combo.itemText(combo.count() - 1)
+    assert len(requested) < shown * 3
+    combo.hidePopup()
+    toolbar.thumbnails.shutdown()
+
+
+@pytest.mark.skipif(find_rcc() is None, reason="rcc is not available")
+@pytest.mark.parametrize("as_text", [False, True])
+def test_export_resource(app, tmp_path, as_text):
+    """Test a theme exported as a resource is applied by its loader."""
+    theme = {
+        "QLabel": {"color": "red"},
+        "QPushButton": {"color": "red"},
+        "QCheckBox::indicator": {"image": "url(icons/checked.png)"},
+    }
+    if as_text:
+        theme = json_to_stylesheet(theme)
+    resource, loader = export_resource(
+        theme, tmp_path / "dist" / "my-theme.rcc", base=get_src_dir()
+    )
+    assert loader.name == "my_theme.py"
+    spec = importlib.util.spec_from_file_location("my_theme", loader)
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    try:
+        qss = module.load(app)
+        assert app.styleSheet() == qss
+        assert "QLabel, QPushButton{color:red;}" in qss
+        image = re.search(r"url\((.*?)\)", qss).group(1)
+        assert image.startswith(":/qstyler/my-theme/") and QFile.exists(image)
+    finally:
+        app.setStyleSheet("")
+        QResource.unregisterResource(str(resource))
+
+
+def test_preview_tabs_built_lazily(app):
+    """Test preview tabs are built when shown, with the scoped sheet."""
+    window = MainWindow()
+    collections = window.collections
+    assert not collections.is_built and not collections.children()
+    window.styler.scope.apply("QLabel { color: #123456; }")
+    collections.setStyleSheet("")
+    window.show()
+    assert not collections.is_built
+    window.tabWidget.setCurrentWidget(collections)
+    assert collections.is_built and collections.listWidget.count() == 15
+    assert collections.styleSheet() == "QLabel { color: #123456; }"
+    assert not window.editors.is_built
+    window.close()
+    window.deleteLater()
+    empty = LazyTab()
+    empty.show()
+    assert empty.ensure_built().is_built and not empty.children()
+    empty.deleteLater()